@@ -1,3 +1,4 @@
+import functools
 from pathlib import Path
 from typing import Annotated
 import uvloop
@@ -9,23 +10,29 @@ from aiogram.client.default import DefaultBotProperties
 from app import main
 from app import handlers
 from app.meta import get_app_metadata
-from app.main import dp, setup_logging
-from app.config import get_app_config
+from app.main import dp, setup_logging, setup_storage
+from app.config import AppConfig, get_app_config
 from app.database import Database
 from app.scheduler import Scheduler
 from app.geo import Geolocator
+from app.ratelimit import SendRateLimiter
+from app.metrics import MetricsServer
+from app.webhook import run_webhook
+from app.sharding import Supervisor
+from app.handlers.middlewares import setup_anti_flood
 
 
-def run_app(
-    env_file: Annotated[Path | None, typer.Option(help="default: .env")] = None,
-    dev: Annotated[bool, typer.Option(is_flag=True, hidden=True)] = False,
-):
+def load_config(env_file: Path | None, dev: bool) -> AppConfig:
     main.DEV_MODE = dev
 
     if main.DEV_MODE and env_file is None:
         env_file = Path(".dev.env")
 
     app_cfg = dp["app_cfg"] = get_app_config(env_file=env_file)
+    return app_cfg
+
+
+def setup(app_cfg: AppConfig, *, workers: int = 1, worker_index: int = 0) -> Bot:
     bot = dp["main_bot"] = Bot(
         token=app_cfg.bot_token.get_secret_value(),
         default=DefaultBotProperties(
@@ -35,8 +42,13 @@ def run_app(
             link_preview_is_disabled=True,
         ),
     )
+    rate_limiter = SendRateLimiter.from_config(
+        app_cfg, workers=workers, worker_index=worker_index
+    )
+    bot.session.middleware(rate_limiter)
 
     setup_logging()
+    setup_storage(app_cfg)
 
     dp["app_metadata"] = get_app_metadata()
     dp["db"] = Database()
@@ -44,8 +56,61 @@ def run_app(
     dp["geo"] = Geolocator()
 
     handlers.register()
+    setup_anti_flood(app_cfg)
+
+    if app_cfg.metrics_port is not None:
+        metrics_server = MetricsServer(
+            app_cfg.metrics_host,
+            app_cfg.metrics_port + (worker_index + 1 if workers > 1 else 0),
+        )
+        dp.startup.register(metrics_server.start)
+        dp.shutdown.register(metrics_server.stop)
+
+    return bot
+
+
+def run_worker(
+    env_file: Path | None,
+    dev: bool,
+    workers: int,
+    index: int,
+    unix_socket: str,
+    restarted: bool,
+):
+    main.PRIMARY_PROCESS = index == 0
+    main.RESTARTED = restarted
+    app_cfg = load_config(env_file, dev)
+    bot = setup(app_cfg, workers=workers, worker_index=index)
+    run_webhook(bot, app_cfg, unix_socket=unix_socket)
+
+
+def run_app(
+    env_file: Annotated[Path | None, typer.Option(help="default: .env")] = None,
+    dev: Annotated[bool, typer.Option(is_flag=True, hidden=True)] = False,
+    webhook: Annotated[
+        bool, typer.Option(help="Serve updates by webhook instead of long polling")
+    ] = False,
+    workers: Annotated[
+        int,
+        typer.Option(
+            min=1, help="Worker processes sharing updates by user, implies --webhook"
+        ),
+    ] = 1,
+):
+    app_cfg = load_config(env_file, dev)
+
+    if workers > 1:
+        setup_logging()
+        Supervisor(
+            app_cfg, workers, functools.partial(run_worker, env_file, dev, workers)
+        ).run()
+        return
 
-    uvloop.run(dp.start_polling(bot))
+    bot = setup(app_cfg)
+    if webhook:
+        run_webhook(bot, app_cfg)
+    else:
+        uvloop.run(dp.start_polling(bot))
 
 
 if __name__ == "__main__":
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Iterable
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, NamedTuple
 import asyncio
+import datetime
 import itertools
-from collections import defaultdict
 from contextlib import asynccontextmanager
 
+from dateutil.relativedelta import relativedelta
 from pydantic import BaseModel
 
 import sqlalchemy as sa
@@ -18,10 +19,20 @@ from aiogram.dispatcher.event.bases import skip
 
 from app import utils
 from app.main import dp
-from app.utils import Singleton
+from app.mood import Mood
+from app.utils import Singleton, LRUCache, LockPool
 
 from app._database import orm
-from app._database.models import MoodConfig, MoodMonth, UserConfig, UserLastMessage
+from app._database.models import (
+    DEFAULT_TIMEZONE,
+    MoodConfig,
+    MoodMonth,
+    MoodStats,
+    UserConfig,
+    UserLastMessage,
+)
+from app._database.writer import WriteBehindQueue
+from app._database.extract import extract_users
 
 
 if TYPE_CHECKING:
@@ -31,19 +42,65 @@ if TYPE_CHECKING:
 logger = utils.get_logger()
 
 
+class DueNotification(NamedTuple):
+    mood_config: MoodConfig
+    user_config: UserConfig
+    last_message: UserLastMessage | None
+    """Last message of user in notify chat"""
+    due_time: datetime.datetime
+    """Local time notification is due at"""
+
+
 class Cache(metaclass=Singleton):
-    users: dict[int, UserConfig] = {}
-    locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+    def __init__(
+        self,
+        *,
+        users_maxsize: int | None = None,
+        users_ttl: float | None = None,
+        mood_months_maxsize: int | None = None,
+    ) -> None:
+        self.users: LRUCache[int, UserConfig] = LRUCache(users_maxsize, ttl=users_ttl)
+        self.mood_months: LRUCache[tuple[int, int, int], MoodMonth] = LRUCache(
+            mood_months_maxsize
+        )
+        """`(user_id, year, month)`: `MoodMonth`, written through by `MoodMonth.merge`"""
+        self.mood_years: LRUCache[tuple[int, int], tuple[tuple[int, ...], ...]] = (
+            LRUCache(mood_months_maxsize)
+        )
+        """`(user_id, year)`: `MoodDays.counts` of each month, dropped by `MoodMonth.merge`"""
+        self.locks = LockPool()
 
 
 class Database(metaclass=Singleton):
-    def __init__(self) -> None:
-        self.engine = create_async_engine(dp["app_cfg"].get_db_uri(mode="async"))
+    def __init__(self, cache: Cache | None = None) -> None:
+        app_cfg = dp["app_cfg"]
+        self.engine = create_async_engine(app_cfg.get_db_uri(mode="async"))
         self.sessionmaker = async_sessionmaker(self.engine)
-        self.cache = Cache()
+        self.cache = cache or Cache(
+            users_maxsize=app_cfg.user_cache_size,
+            users_ttl=app_cfg.user_cache_ttl,
+            mood_months_maxsize=app_cfg.mood_cache_size,
+        )
+        self.users_writer = WriteBehindQueue[int, User](
+            "users",
+            self.save_user_profiles,
+            max_size=app_cfg.write_behind_max_size,
+            interval=app_cfg.write_behind_interval,
+            max_pending=app_cfg.write_behind_max_pending,
+        )
+        self.last_message_writer = WriteBehindQueue[
+            tuple[int, int, int], UserLastMessage
+        ](
+            "user_last_message",
+            self.save_last_messages,
+            max_size=app_cfg.write_behind_max_size,
+            interval=app_cfg.write_behind_interval,
+            max_pending=app_cfg.write_behind_max_pending,
+        )
 
         dp.startup.register(self.startup)
         dp.startup.register(self.handle_offline_updates)
+        dp.shutdown.register(self.shutdown)
         dp.update.outer_middleware.register(self.outer_middleware)  # pyright: ignore[reportArgumentType]
         dp.update.register(self.save_users_handler)
         dp.message.register(self.save_last_message_handler)
@@ -62,6 +119,12 @@ class Database(metaclass=Singleton):
             logger.exception("Connecting to database failed\n\n---")
             raise
         logger.info("Connected to database")
+        await self.users_writer.start()
+        await self.last_message_writer.start()
+
+    async def shutdown(self):
+        await self.users_writer.stop()
+        await self.last_message_writer.stop()
 
     async def get_last_message(
         self, chat_id: int, *, user_id: int, topic_id: int | None = None
@@ -80,28 +143,34 @@ class Database(metaclass=Singleton):
                 return UserLastMessage.from_orm(obj)
 
     async def save_last_message_handler(self, m: Message):
-        task = asyncio.create_task(self.save_last_message(m))
-        dp._handle_update_tasks.add(task)
-        task.add_done_callback(dp._handle_update_tasks.discard)
-        skip()
-
-    async def save_last_message(self, m: Message):
         user = m.from_user
-        if user is None or m.chat.type == "private":
-            return
+        if user is not None and m.chat.type != "private":
+            last_message = UserLastMessage(
+                user_id=user.id,
+                chat_id=m.chat.id,
+                topic_id=utils.get_topic_id(m) or 0,
+                message=m,
+            )
+            self.last_message_writer.put(
+                (last_message.user_id, last_message.chat_id, last_message.topic_id),
+                last_message,
+            )
+        skip()
 
-        last_message = UserLastMessage(
-            user_id=user.id,
-            chat_id=m.chat.id,
-            topic_id=utils.get_topic_id(m) or 0,
-            message=m,
-        )
-        await last_message.merge()
+    async def save_last_messages(self, last_messages: list[UserLastMessage]):
+        rows = [
+            last_message.model_dump(include=orm.UserLastMessage.columns)
+            for last_message in sorted(
+                last_messages, key=lambda x: (x.user_id, x.chat_id, x.topic_id)
+            )
+        ]
+        async with self.begin() as session:
+            await session.execute(orm.UserLastMessage.upsert(rows))
 
     async def handle_offline_updates(self, bots: list[Bot], db: Database):
         from app import main
 
-        if main.DEV_MODE:
+        if main.DEV_MODE or not main.PRIMARY_PROCESS or main.RESTARTED:
             return
         try:
             async with asyncio.timeout(15):
@@ -116,6 +185,8 @@ class Database(metaclass=Singleton):
         offline_updates: list[Update] = []
 
         for bot in bots:
+            # webhook of previous run blocks `getUpdates`, its updates are kept
+            await bot.delete_webhook(drop_pending_updates=False)
             req = GetUpdates()
             while True:
                 updates = await bot(req)
@@ -134,16 +205,7 @@ class Database(metaclass=Singleton):
             logger.info("No offline updates")
 
     def extract_users(self, event: BaseModel) -> list[User]:
-        users: list[User] = []
-        fields = list(event.model_dump())
-
-        for value in map(lambda x: getattr(event, x), fields):
-            if isinstance(value, User):
-                users += [value]
-            elif isinstance(value, BaseModel):
-                users += self.extract_users(value)
-
-        return users
+        return extract_users(event)
 
     @asynccontextmanager
     async def begin(self):
@@ -156,21 +218,35 @@ class Database(metaclass=Singleton):
             yield session
 
     async def get_user(self, user_id: int) -> UserConfig:
-        if user_id in self.cache.users:
-            return self.cache.users[user_id]
+        if user_config := self.cache.users.get(user_id):
+            return user_config
 
         lock_key = f"user:{user_id}"
-        async with self.cache.locks[lock_key], self.sessionmaker() as session:
-            stmt = sa.select(orm.UserConfig).where(orm.UserConfig.user_id == user_id)
-            if orm_user := await session.scalar(stmt):
-                user_config = UserConfig.model_validate(orm_user, from_attributes=True)
-            else:
-                user_config = UserConfig(user_id=user_id)
+        async with self.cache.locks[lock_key]:
+            # loaded by concurrent call while waiting for lock
+            if user_config := self.cache.users.get(user_id):
+                return user_config
+
+            async with self.sessionmaker() as session:
+                stmt = sa.select(orm.UserConfig).where(
+                    orm.UserConfig.user_id == user_id
+                )
+                if orm_user := await session.scalar(stmt):
+                    user_config = UserConfig.model_validate(
+                        orm_user, from_attributes=True
+                    )
+                else:
+                    user_config = UserConfig(user_id=user_id)
             self.cache.users[user_id] = user_config
 
-        return self.cache.users[user_id]
+        return user_config
 
     async def get_mood_month(self, user_id: int, *, year: int, month: int):
+        key = (user_id, year, month)
+        # callers mutate month before `merge`, so cache keeps own copy
+        if mood_month := self.cache.mood_months.get(key):
+            return mood_month.model_copy(deep=True)
+
         async with self() as session:
             stmt = (
                 sa.select(orm.MoodMonth)
@@ -179,14 +255,168 @@ class Database(metaclass=Singleton):
                 .where(orm.MoodMonth.month == month)
             )
             if mood_month_orm := await session.scalar(stmt):
-                return MoodMonth.from_orm(mood_month_orm)
+                mood_month = MoodMonth.from_orm(mood_month_orm)
+            else:
+                mood_month = MoodMonth(
+                    user_id=user_id,
+                    year=year,
+                    month=month,
+                )
+
+        # don't override value written by concurrent `merge`
+        if key not in self.cache.mood_months:
+            self.cache.mood_months[key] = mood_month.model_copy(deep=True)
+        return mood_month
+
+    async def get_mood_range(
+        self,
+        user_id: int,
+        start: datetime.date,
+        end: datetime.date,
+        *,
+        chunk_size: int = 12,
+    ) -> AsyncIterator[MoodMonth]:
+        """
+        Months from `start` to `end` inclusive (days are ignored),
+        months without row are yielded as empty
+
+        Rows are fetched by `chunk_size` months per query and session is
+        closed before months of chunk are yielded, so slow or abandoned
+        iteration does not hold a connection
+        """
+        month = start.replace(day=1)
+        end = end.replace(day=1)
+        while month <= end:
+            chunk_end = min(end, month + relativedelta(months=chunk_size - 1))
+            stmt = (
+                sa.select(orm.MoodMonth)
+                .where(orm.MoodMonth.user_id == user_id)
+                .where(
+                    sa.tuple_(orm.MoodMonth.year, orm.MoodMonth.month).between(
+                        sa.tuple_(month.year, month.month),
+                        sa.tuple_(chunk_end.year, chunk_end.month),
+                    )
+                )
+            )
+            async with self() as session:
+                rows = {
+                    (mood_month.year, mood_month.month): mood_month
+                    for mood_month in map(
+                        MoodMonth.from_orm, await session.scalars(stmt)
+                    )
+                }
+
+            while month <= chunk_end:
+                yield rows.get((month.year, month.month)) or MoodMonth(
+                    user_id=user_id, year=month.year, month=month.month
+                )
+                month += relativedelta(months=1)
+
+    async def get_mood_year(
+        self, user_id: int, year: int
+    ) -> tuple[tuple[int, ...], ...]:
+        """`MoodDays.counts` of each month of year"""
+        key = (user_id, year)
+        if counts := self.cache.mood_years.get(key):
+            return counts
+
+        counts = tuple(
+            [
+                mood_month.days.counts()
+                async for mood_month in self.get_mood_range(
+                    user_id, datetime.date(year, 1, 1), datetime.date(year, 12, 1)
+                )
+            ]
+        )
+        self.cache.mood_years[key] = counts
+        return counts
+
+    async def get_mood_stats(self, user_id: int) -> MoodStats:
+        """Stats of user, rebuilt from months if not materialized yet"""
+        async with self() as session:
+            stmt = sa.select(orm.MoodStats).where(orm.MoodStats.user_id == user_id)
+            if obj := await session.scalar(stmt):
+                return MoodStats.from_orm(obj)
+        return await self.rebuild_mood_stats(user_id)
+
+    async def update_mood_stats(
+        self, user_id: int, date: datetime.date, old: Mood, new: Mood
+    ) -> MoodStats:
+        """Apply day mood change, must be called after `MoodMonth.merge`"""
+        async with self() as session:
+            stmt = sa.select(orm.MoodStats).where(orm.MoodStats.user_id == user_id)
+            obj = await session.scalar(stmt)
+
+        # rebuilt stats already include change
+        if obj is None:
+            return await self.rebuild_mood_stats(user_id)
 
-            mood_month = MoodMonth(
-                user_id=user_id,
-                year=year,
-                month=month,
+        stats = MoodStats.from_orm(obj)
+        if not stats.apply(date, old, new):
+            return await self.rebuild_mood_stats(user_id)
+        await stats.merge()
+        return stats
+
+    async def rebuild_mood_stats(self, user_id: int) -> MoodStats:
+        async with self() as session:
+            stmt = (
+                sa.select(orm.MoodMonth)
+                .where(orm.MoodMonth.user_id == user_id)
+                .order_by(orm.MoodMonth.year, orm.MoodMonth.month)
+            )
+            months = map(MoodMonth.from_orm, await session.scalars(stmt))
+            stats = MoodStats.from_months(user_id, months)
+        await stats.merge()
+        return stats
+
+    async def rebuild_all_mood_stats(self, *, batch_size: int = 1000) -> int:
+        """
+        Recompute stats of every user from `mood` table, stats of users
+        without moods are deleted, returns users count
+        """
+
+        async def save(batch: list[MoodStats]):
+            async with self.begin() as session:
+                await session.execute(
+                    orm.MoodStats.upsert(
+                        [x.model_dump(include=orm.MoodStats.columns) for x in batch]
+                    )
+                )
+
+        count = 0
+        batch: list[MoodStats] = []
+        months: list[MoodMonth] = []
+        stmt = (
+            sa.select(orm.MoodMonth)
+            .order_by(orm.MoodMonth.user_id, orm.MoodMonth.year, orm.MoodMonth.month)
+            .execution_options(yield_per=batch_size)
+        )
+        async with self() as session:
+            async for mood_month_orm in await session.stream_scalars(stmt):
+                mood_month = MoodMonth.from_orm(mood_month_orm)
+                if months and months[0].user_id != mood_month.user_id:
+                    batch += [MoodStats.from_months(months[0].user_id, months)]
+                    months = []
+                months += [mood_month]
+
+                if len(batch) >= batch_size:
+                    await save(batch)
+                    count += len(batch)
+                    batch = []
+
+        if months:
+            batch += [MoodStats.from_months(months[0].user_id, months)]
+        if batch:
+            await save(batch)
+            count += len(batch)
+
+        async with self.begin() as session:
+            await session.execute(
+                sa.delete(orm.MoodStats).where(
+                    ~sa.exists().where(orm.MoodMonth.user_id == orm.MoodStats.user_id)
+                )
             )
-            return mood_month
+        return count
 
     async def get_mood_config(self, user_id: int):
         async with self() as session:
@@ -196,29 +426,151 @@ class Database(metaclass=Singleton):
 
             return MoodConfig(user_id=user_id)
 
+    async def get_due_notifications(
+        self, since: datetime.datetime, until: datetime.datetime
+    ) -> list[DueNotification]:
+        """
+        Enabled notify configs with local notify time within `(since, until]`,
+        window must not exceed a day; user and last message in notify chat
+        are loaded by the same query
+        """
+        tz = sa.func.coalesce(orm.UserConfig.timezone, DEFAULT_TIMEZONE)
+        local_until = sa.func.timezone(tz, until)
+        # latest local notify time not later than `until`
+        due = sa.cast(local_until, sa.Date) + orm.MoodConfig.notify_time
+        due = sa.case((due <= local_until, due), else_=due - datetime.timedelta(days=1))
+        stmt = (
+            sa.select(orm.MoodConfig, orm.UserConfig, orm.UserLastMessage, due)
+            .outerjoin(orm.UserConfig, orm.UserConfig.user_id == orm.MoodConfig.user_id)
+            .outerjoin(
+                orm.UserLastMessage,
+                sa.and_(
+                    orm.UserLastMessage.user_id == orm.MoodConfig.user_id,
+                    orm.UserLastMessage.chat_id == orm.MoodConfig.notify_chat_id,
+                    orm.UserLastMessage.topic_id
+                    == sa.func.coalesce(orm.MoodConfig.notify_chat_topic_id, 0),
+                ),
+            )
+            .where(orm.MoodConfig.notify_state)
+            .where(_notify_time_filter(since, until))
+            .where(sa.func.timezone(tz, due) > since)
+        )
+        async with self() as session:
+            rows = (await session.execute(stmt)).all()
+
+        result: list[DueNotification] = []
+        for mood_config_orm, user_orm, last_message_orm, due_time in rows:
+            mood_config = MoodConfig.from_orm(mood_config_orm)
+            user_id = mood_config.user_id
+
+            if (user_config := self.cache.users.get(user_id)) is None:
+                user_config = self.cache.users[user_id] = (
+                    UserConfig.model_validate(user_orm, from_attributes=True)
+                    if user_orm is not None
+                    else UserConfig(user_id=user_id)
+                )
+
+            last_message = None
+            if mood_config.notify_chat_id:
+                # not flushed yet write is newer than stored one
+                last_message = self.last_message_writer.get(
+                    (
+                        user_id,
+                        mood_config.notify_chat_id,
+                        mood_config.notify_chat_topic_id or 0,
+                    )
+                )
+                if last_message is None and last_message_orm is not None:
+                    last_message = UserLastMessage.from_orm(last_message_orm)
+
+            result += [
+                DueNotification(mood_config, user_config, last_message, due_time)
+            ]
+        return result
+
+    async def get_users(self, user_ids: Iterable[int]) -> dict[int, UserConfig]:
+        """Bulk `get_user`, cache misses are loaded with one query"""
+        result: dict[int, UserConfig] = {}
+        missing: list[int] = []
+        for user_id in user_ids:
+            if user_config := self.cache.users.get(user_id):
+                result[user_id] = user_config
+            else:
+                missing.append(user_id)
+
+        if not missing:
+            return result
+
+        loaded: dict[int, UserConfig] = {}
+        async with self() as session:
+            stmt = sa.select(orm.UserConfig).where(orm.UserConfig.user_id.in_(missing))
+            for orm_user in await session.scalars(stmt):
+                loaded[orm_user.user_id] = UserConfig.model_validate(
+                    orm_user, from_attributes=True
+                )
+
+        for user_id in missing:
+            # keep instance loaded by concurrent `get_user`
+            if user_id in self.cache.users:
+                result[user_id] = self.cache.users[user_id]
+            else:
+                result[user_id] = self.cache.users[user_id] = loaded.get(
+                    user_id
+                ) or UserConfig(user_id=user_id)
+
+        return result
+
     async def save_users(self, events: Iterable[BaseModel] | BaseModel):
-        async with self.cache.locks["save_users_lock"]:
-            if isinstance(events, BaseModel):
-                events = (events,)
-
-            users = list(itertools.chain(*map(self.extract_users, events)))
-            if not users:
-                return
-            try:
-                async with self.begin() as session:
-                    for user in users:
-                        user_config = await self.get_user(user.id)
-                        user_config.first_name = user.first_name
-                        user_config.last_name = user.last_name
-                        user_config.username = user.username
-                        await session.merge(user_config.to_orm())
-            except Exception:
-                logger.exception("Save users error")
+        if isinstance(events, BaseModel):
+            events = (events,)
+        try:
+            await self.save_user_profiles(
+                itertools.chain(*map(self.extract_users, events))
+            )
+        except Exception:
+            logger.exception("Save users error")
+
+    async def save_user_profiles(self, users: Iterable[User]):
+        # the latest occurrence of user wins
+        users_by_id = {user.id: user for user in users}
+        if not users_by_id:
+            return
+
+        user_configs = await self.get_users(users_by_id)
+        changed = [
+            (user_configs[user.id], user)
+            for user in users_by_id.values()
+            if not _is_same_user(user_configs[user.id], user)
+        ]
+        if not changed:
+            return
+
+        rows = [
+            user_config.model_copy(
+                update=dict(
+                    first_name=user.first_name,
+                    last_name=user.last_name,
+                    username=user.username,
+                )
+            ).model_dump(include=orm.UserConfig.columns)
+            # stable lock order for concurrent upserts
+            for user_config, user in sorted(changed, key=lambda x: x[1].id)
+        ]
+        async with self.begin() as session:
+            await session.execute(
+                orm.UserConfig.upsert(
+                    rows, update=("first_name", "last_name", "username")
+                )
+            )
+
+        for user_config, user in changed:
+            user_config.first_name = user.first_name
+            user_config.last_name = user.last_name
+            user_config.username = user.username
 
     async def save_users_handler(self, update: Update):
-        task = asyncio.create_task(self.save_users(update))
-        dp._handle_update_tasks.add(task)
-        task.add_done_callback(dp._handle_update_tasks.discard)
+        for user in self.extract_users(update):
+            self.users_writer.put(user.id, user)
         skip()
 
     async def outer_middleware(self, handler, event, data: MiddlewareData):
@@ -226,3 +578,33 @@ class Database(metaclass=Singleton):
         if ctx and ctx.user_id:
             data["user_config"] = await self.get_user(ctx.user_id)
         return await handler(event, data)
+
+
+def _notify_time_filter(since: datetime.datetime, until: datetime.datetime):
+    """
+    Index-friendly prefilter of `notify_time`: local times of `(since, until]`
+    at every UTC offset (offsets are multiples of 15 minutes)
+    """
+    if until - since >= datetime.timedelta(minutes=15):
+        return sa.true()
+
+    column = orm.MoodConfig.notify_time
+    conditions = []
+    for offset in range(-12 * 60, 14 * 60 + 1, 15):
+        delta = datetime.timedelta(minutes=offset)
+        start, end = (since + delta).time(), (until + delta).time()
+        if start < end:
+            conditions += [sa.and_(column > start, column <= end)]
+        else:
+            # window crosses local midnight
+            conditions += [column > start, column <= end]
+    return sa.or_(*conditions)
+
+
+def _is_same_user(user_config: UserConfig, user: User) -> bool:
+    # usernames are stored lowercased
+    return (
+        user_config.first_name == user.first_name
+        and user_config.last_name == user.last_name
+        and (user_config.username or "").lower() == (user.username or "").lower()
+    )
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from typing import Annotated, Any, Iterator, get_args, get_origin
+
+from pydantic import BaseModel
+
+from aiogram.types import User
+
+
+__all__ = ("extract_users",)
+
+
+_plans: dict[type[BaseModel], tuple[str, ...]] = {}
+
+
+def _model_types(annotation: Any) -> Iterator[type[BaseModel]]:
+    origin = get_origin(annotation)
+    if origin is None:
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            yield annotation
+        return
+    args = get_args(annotation)
+    if origin is Annotated:
+        args = args[:1]
+    for arg in args:
+        yield from _model_types(arg)
+
+
+def _build_plans(root: type[BaseModel]) -> None:
+    """
+    Extraction plan: names of fields which may contain `User`,
+    directly or in nested models, built from type annotations
+    """
+    graph: dict[type[BaseModel], dict[str, set[type[BaseModel]]]] = {}
+    stack = [root]
+    while stack:
+        cls = stack.pop()
+        if cls in graph or cls in _plans:
+            continue
+        graph[cls] = {
+            name: set(_model_types(field.annotation))
+            for name, field in cls.model_fields.items()
+        }
+        stack += [t for types in graph[cls].values() for t in types]
+
+    # already planned types are final, no need to walk them again;
+    # planned `User` has empty plan, but still is user
+    contains_user = {
+        cls for cls, plan in _plans.items() if plan or issubclass(cls, User)
+    }
+    contains_user |= {cls for cls in graph if issubclass(cls, User)}
+    changed = True
+    while changed:
+        changed = False
+        for cls, fields in graph.items():
+            if cls not in contains_user and any(
+                types & contains_user for types in fields.values()
+            ):
+                contains_user.add(cls)
+                changed = True
+
+    for cls, fields in graph.items():
+        _plans[cls] = tuple(
+            name for name, types in fields.items() if types & contains_user
+        )
+
+
+def _get_plan(cls: type[BaseModel]) -> tuple[str, ...]:
+    if (plan := _plans.get(cls)) is None:
+        _build_plans(cls)
+        plan = _plans[cls]
+    return plan
+
+
+def _walk(obj: BaseModel, users: list[User]) -> None:
+    for name in _get_plan(type(obj)):
+        value = getattr(obj, name)
+        if value is None:
+            continue
+        if isinstance(value, User):
+            users.append(value)
+        elif isinstance(value, BaseModel):
+            _walk(value, users)
+        elif isinstance(value, list | tuple):
+            for item in value:
+                if isinstance(item, User):
+                    users.append(item)
+                elif isinstance(item, BaseModel):
+                    _walk(item, users)
+
+
+def extract_users(event: BaseModel) -> list[User]:
+    """Collect `User` objects of event, walking only fields which may contain them"""
+    users: list[User] = []
+    _walk(event, users)
+    return users
@@ -3,6 +3,7 @@ from typing import (
     ClassVar,
     Final,
     Generic,
+    Iterable,
     Literal,
     TypeVar,
     Self,
@@ -26,10 +27,18 @@ from pydantic import (
 )
 from pydantic.warnings import GenericBeforeBaseModelWarning
 
+import sqlalchemy as sa
+
 from aiogram.types import Message
 
 from app import utils
-from app.mood import _MoodMonthMixin, Mood, create_days_list, create_days_notes_list
+from app.mood import (
+    _MoodMonthMixin,
+    Mood,
+    MoodDays,
+    create_days_list,
+    create_days_notes_list,
+)
 
 from app._database import orm
 
@@ -40,6 +49,8 @@ warnings.filterwarnings("ignore", category=GenericBeforeBaseModelWarning)
 T = TypeVar("T", bound=orm.Base)
 logger = utils.get_logger()
 
+DEFAULT_TIMEZONE = "Europe/Kyiv"
+
 
 class DatabaseMixin(Generic[T], BaseModel):
     model_config = ConfigDict(validate_assignment=True)
@@ -123,7 +134,7 @@ class UserConfig(DatabaseMixin[orm.UserConfig]):
 
     @property
     def tz(self):
-        return ZoneInfo(self.timezone or "Europe/Kyiv")
+        return ZoneInfo(self.timezone or DEFAULT_TIMEZONE)
 
     @property
     def current_time(self):
@@ -142,7 +153,7 @@ class MoodMonth(DatabaseMixin[orm.MoodMonth], _MoodMonthMixin):
     user_id: int
     year: int
     month: int
-    days: list[Mood] = Field(
+    days: MoodDays = Field(
         default_factory=lambda data: create_days_list(data["year"], data["month"])
     )
     days_notes: list[str | None] = Field(
@@ -164,17 +175,37 @@ class MoodMonth(DatabaseMixin[orm.MoodMonth], _MoodMonthMixin):
     def save_mood(self, day: int, mood: Mood):
         self.days[day - 1] = mood
 
+    @property
+    def is_empty(self):
+        return not (self.days.any() or any(self.days_notes))
+
     async def merge(self):
+        """Upsert month, or delete it when empty, with single statement"""
         from app import main
 
-        orm_obj = await super().merge()
-
-        if any(map(int, self.days)) or any(self.days_notes):
-            return orm_obj
-
-        async with main.dp["db"].begin() as session:
-            await session.delete(orm_obj)
-            return orm_obj
+        db = main.dp["db"]
+        key = (self.user_id, self.year, self.month)
+        is_empty = self.is_empty
+
+        async with db.begin() as session:
+            if is_empty:
+                stmt = (
+                    sa.delete(orm.MoodMonth)
+                    .where(orm.MoodMonth.user_id == self.user_id)
+                    .where(orm.MoodMonth.year == self.year)
+                    .where(orm.MoodMonth.month == self.month)
+                )
+            else:
+                stmt = orm.MoodMonth.upsert(
+                    [self.model_dump(include=orm.MoodMonth.columns)]
+                )
+            await session.execute(stmt)
+
+        db.cache.mood_years.pop((self.user_id, self.year))
+        if is_empty:
+            db.cache.mood_months.pop(key)
+        else:
+            db.cache.mood_months[key] = self.model_copy(deep=True)
 
     @field_validator("days_notes", mode="before")
     @classmethod
@@ -183,20 +214,111 @@ class MoodMonth(DatabaseMixin[orm.MoodMonth], _MoodMonthMixin):
             notes = create_days_notes_list(info.data["year"], info.data["month"])
         return notes
 
-    @field_validator("days", mode="before")
-    @classmethod
-    def _validate_days(cls, days: list[int | Mood]):
-        for i, mood in enumerate(days):
-            if isinstance(mood, int):
-                days[i] = list(Mood)[mood]
+    create_days_list = staticmethod(create_days_list)
 
-        return days
 
-    @field_serializer("days")
-    def _serialize_days(self, days: list[Mood]):
-        return list(map(int, days))
+class MoodStats(DatabaseMixin[orm.MoodStats]):
+    """
+    Materialized mood statistics of user, updated incrementally by `apply`
 
-    create_days_list = staticmethod(create_days_list)
+    Streak is the latest run of consecutive marked days
+    """
+
+    user_id: int
+    counts: list[int] = Field(default_factory=lambda: [0] * len(Mood))
+    """Marked days per mood, indexed by `Mood.index`"""
+    streak_start: datetime.date | None = None
+    streak_end: datetime.date | None = None
+    best_streak: int = 0
+
+    @property
+    def marked_days(self):
+        return sum(self.counts[1:])
+
+    @property
+    def streak(self):
+        if self.streak_start is None or self.streak_end is None:
+            return 0
+        return (self.streak_end - self.streak_start).days + 1
+
+    def current_streak(self, today: datetime.date):
+        """Streak length if it's not interrupted by `today`"""
+        if self.streak_end is None or self.streak_end < today - datetime.timedelta(1):
+            return 0
+        return self.streak
+
+    def apply(self, date: datetime.date, old: Mood, new: Mood) -> bool:
+        """
+        Apply mood change of day
+
+        :return: `False` when streaks can't be updated incrementally
+            and stats must be rebuilt from months
+        """
+        if old is new:
+            return True
+        if old is not Mood.UNSET:
+            self.counts[old.index] -= 1
+        if new is not Mood.UNSET:
+            self.counts[new.index] += 1
+        if (old is Mood.UNSET) == (new is Mood.UNSET):
+            return True
+
+        one_day = datetime.timedelta(1)
+        start, end = self.streak_start, self.streak_end
+        streak = self.streak
+
+        if new is not Mood.UNSET:
+            if start is None or end is None or date > end + one_day:
+                self.streak_start = self.streak_end = date
+            elif date == end + one_day:
+                self.streak_end = date
+            else:
+                # may join earlier runs
+                return False
+        else:
+            # shrinking the best run may leave unknown run as best
+            if (
+                start is None
+                or end is None
+                or start == end
+                or streak == self.best_streak
+            ):
+                return False
+            if date == end:
+                self.streak_end = end - one_day
+            elif date == start:
+                self.streak_start = start + one_day
+            else:
+                return False
+
+        self.best_streak = max(self.best_streak, self.streak)
+        return True
+
+    async def merge(self):
+        from app import main
+
+        async with main.dp["db"].begin() as session:
+            await session.execute(
+                orm.MoodStats.upsert([self.model_dump(include=orm.MoodStats.columns)])
+            )
+
+    @classmethod
+    def from_months(cls, user_id: int, months: Iterable[MoodMonth]) -> Self:
+        """Full computation, `months` must be ordered by date"""
+        stats = cls(user_id=user_id)
+        one_day = datetime.timedelta(1)
+        for mood_month in months:
+            for day, mood in enumerate(mood_month.days, 1):
+                if mood is Mood.UNSET:
+                    continue
+                date = datetime.date(mood_month.year, mood_month.month, day)
+                stats.counts[mood.index] += 1
+                if stats.streak_end is not None and stats.streak_end + one_day == date:
+                    stats.streak_end = date
+                else:
+                    stats.streak_start = stats.streak_end = date
+                stats.best_streak = max(stats.best_streak, stats.streak)
+        return stats
 
 
 class MoodConfig(DatabaseMixin[orm.MoodConfig]):
@@ -233,13 +355,6 @@ class MoodConfig(DatabaseMixin[orm.MoodConfig]):
     def notify_time_str(self):
         return self.notify_time.strftime(r"%H:%M")
 
-    async def merge(self):
-        from app.handlers.mood import MoodNotifyConfigurator
-
-        result = await super().merge()
-        await utils.suppress_error(MoodNotifyConfigurator.on_change_config(self))
-        return result
-
 
 class UserLastMessage(DatabaseMixin[orm.UserLastMessage]):
     user_id: int
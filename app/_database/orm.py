@@ -1,12 +1,23 @@
 from __future__ import annotations
 
 import datetime
-from typing import TYPE_CHECKING, Any, ClassVar, Self
+from typing import TYPE_CHECKING, Any, ClassVar, Iterable, Self
 
 import sqlalchemy as sa
-from sqlalchemy import JSON, BigInteger, Integer, String, Time, ARRAY, Text
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Date,
+    Integer,
+    LargeBinary,
+    String,
+    Time,
+    ARRAY,
+    Text,
+)
 from sqlalchemy.orm import Mapped, mapped_column as column
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy_utc import UtcDateTime, utcnow
 
@@ -25,11 +36,13 @@ class Base(DeclarativeBase, AsyncAttrs):
 
     if TYPE_CHECKING:
         columns: ClassVar[set[str]]
+        pk_columns: ClassVar[tuple[str, ...]]
 
     def __init_subclass__(cls, table: str, **kw):
         cls.__tablename__ = table
         super().__init_subclass__(**kw)
         cls.columns = set(map(lambda x: x.name, sa.inspect(cls).columns))
+        cls.pk_columns = tuple(map(lambda x: x.name, sa.inspect(cls).primary_key))
 
     def orm_dump(self):
         exclude = "created_at", "updated_at"
@@ -40,15 +53,42 @@ class Base(DeclarativeBase, AsyncAttrs):
         data = obj.model_dump(include=cls.columns)
         return cls(**data)
 
+    @classmethod
+    def upsert(cls, rows: list[dict[str, Any]], *, update: Iterable[str] | None = None):
+        """
+        `INSERT ... ON CONFLICT (<primary key>) DO UPDATE` for many rows
+
+        :param update: Columns to update on conflict, default: all non-key columns of rows
+        """
+        stmt = insert(cls).values(rows)
+        if update is None:
+            update = rows[0].keys() - {*cls.pk_columns, "created_at", "updated_at"}
+        return stmt.on_conflict_do_update(
+            index_elements=cls.pk_columns,
+            set_={
+                **{column: stmt.excluded[column] for column in update},
+                "updated_at": utcnow(),
+            },
+        )
+
 
 class MoodMonth(Base, table="mood"):
     user_id: Mapped[int] = column(BigInteger, primary_key=True)
     year: Mapped[int] = column(Integer, primary_key=True)
     month: Mapped[int] = column(Integer, primary_key=True)
-    days: Mapped[list[int]] = column(JSON, nullable=False)
+    days: Mapped[bytes] = column(LargeBinary, nullable=False)
+    """One byte per day: `Mood.index`"""
     days_notes: Mapped[list[str] | None] = column(ARRAY(Text))
 
 
+class MoodStats(Base, table="mood_stats"):
+    user_id: Mapped[int] = column(BigInteger, primary_key=True)
+    counts: Mapped[list[int]] = column(ARRAY(Integer), nullable=False)
+    streak_start: Mapped[datetime.date | None] = column(Date, nullable=True)
+    streak_end: Mapped[datetime.date | None] = column(Date, nullable=True)
+    best_streak: Mapped[int] = column(Integer, server_default=sa.text("0"))
+
+
 class UserConfig(Base, table="users"):
     user_id: Mapped[int] = column(BigInteger, primary_key=True)
     first_name: Mapped[str | None] = column(String(64), nullable=True)
@@ -67,6 +107,14 @@ class MoodConfig(Base, table="mood_config"):
     notify_time: Mapped[datetime.time] = column(Time, server_default=sa.text("'00:00'"))
     notify_current_day: Mapped[bool] = column(server_default=sa.text("false"))
 
+    __table_args__ = (
+        sa.Index(
+            "ix_mood_config_notify_time",
+            "notify_time",
+            postgresql_where=sa.text("notify_state"),
+        ),
+    )
+
 
 class UserLastMessage(Base, table="user_last_message"):
     user_id: Mapped[int] = column(BigInteger, primary_key=True)
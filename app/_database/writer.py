@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable
+
+from app import metrics, utils
+
+
+logger = utils.get_logger()
+
+flush_latency = metrics.Histogram(
+    "write_behind_flush_seconds",
+    "Duration of write-behind flush, including split of failed batch",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    labels=("queue",),
+)
+
+
+@dataclass(slots=True)
+class WriteBehindStats:
+    queued: int = 0
+    coalesced: int = 0
+    flushed: int = 0
+    flushes: int = 0
+    errors: int = 0
+    retried: int = 0
+    dropped: int = 0
+    overflowed: int = 0
+    last_flush_latency: float = 0.0
+    max_flush_latency: float = 0.0
+
+
+class WriteBehindQueue[K: Hashable, V]:
+    """
+    Collects writes in memory, keeps only the latest value per key
+    and flushes them in bulk on size or time threshold.
+    If batch fails, it is split in halves until failing values are found,
+    they are put back unless newer value is pending. Splitting stops
+    when two values fail in a row: database is down, rest of batch is put
+    back untried. Value is dropped after `max_attempts` only if other
+    writes succeed meanwhile, so outage loses nothing and is retried
+    with backoff. New keys are dropped while `max_pending` keys wait
+
+    :param flush_callback: Persists batch of values, called sequentially
+    :param max_size: Pending keys count that triggers flush
+    :param interval: Max seconds between flushes
+    :param max_attempts: Failed writes of value before it is dropped
+    :param max_backoff: Max seconds between flushes while they fail
+    :param max_pending: Pending keys limit, e.g. during database outage
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_callback: Callable[[list[V]], Awaitable[object]],
+        *,
+        max_size: int = 500,
+        interval: float = 1.0,
+        max_attempts: int = 5,
+        max_backoff: float = 60.0,
+        max_pending: int = 100_000,
+    ) -> None:
+        self.name = name
+        self.flush_callback = flush_callback
+        self.max_size = max_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.max_pending = max_pending
+        self.stats = WriteBehindStats()
+        self._pending: dict[K, V] = {}
+        self._attempts: dict[K, int] = {}
+        """`key`: failed writes of pending value"""
+        self._failures = 0
+        """Flushes in a row that wrote nothing"""
+        self._overflowed = 0
+        """Values dropped by `max_pending` since last flush"""
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def get(self, key: K) -> V | None:
+        """Pending value of key, not flushed yet"""
+        return self._pending.get(key)
+
+    def put(self, key: K, value: V) -> None:
+        self.stats.queued += 1
+        if self._pending.pop(key, None) is not None:
+            self.stats.coalesced += 1
+        elif len(self._pending) >= self.max_pending:
+            self._overflow()
+            return
+        self._pending[key] = value
+        self._attempts.pop(key, None)
+        if len(self._pending) >= self.max_size:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(
+                self._run(), name=f"write_behind:{self.name}"
+            )
+
+    async def stop(self) -> None:
+        """Stop background flusher and flush pending writes"""
+        if self._task is not None:
+            # not cancelled: flush in progress must not lose its batch
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        await self.flush()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            if self._failures:
+                delay = min(self.interval * 2**self._failures, self.max_backoff)
+            else:
+                delay = self.interval
+            deadline = loop.time() + delay
+            while not self._stopping:
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        await self._wakeup.wait()
+                except TimeoutError:
+                    break
+                self._wakeup.clear()
+                if not self._failures:
+                    break  # size threshold, ignored while backing off
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch = self._pending
+            self._pending = {}
+
+            if self._overflowed:
+                logger.error(
+                    f"{self.name}: {self._overflowed} writes dropped, "
+                    f"{self.max_pending} keys were pending"
+                )
+                self._overflowed = 0
+
+            start = time.perf_counter()
+            try:
+                await self.flush_callback(list(batch.values()))
+            except Exception:
+                self.stats.errors += 1
+                logger.exception(
+                    f"{self.name}: flush of {len(batch)} items failed, splitting batch"
+                )
+                if len(batch) > 1:
+                    failed, untried = await self._flush_split(batch)
+                else:
+                    failed, untried = batch, {}
+            else:
+                failed, untried = {}, {}
+                self.stats.flushes += 1
+            finally:
+                latency = time.perf_counter() - start
+                flush_latency.observe(latency, queue=self.name)
+                self.stats.last_flush_latency = latency
+                self.stats.max_flush_latency = max(
+                    self.stats.max_flush_latency, latency
+                )
+
+            written = len(batch) - len(failed) - len(untried)
+            self.stats.flushed += written
+            for key in batch.keys() - failed.keys() - untried.keys():
+                self._attempts.pop(key, None)
+            self._retry(untried, count_attempts=False)
+            # failed values go last, so next flush writes others before them;
+            # nothing written: database is down rather than values are bad
+            self._retry(failed, count_attempts=written > 0)
+            self._failures = 0 if written else self._failures + 1
+
+    async def _flush_split(self, batch: dict[K, V]) -> tuple[dict[K, V], dict[K, V]]:
+        """
+        Write halves of failed batch recursively,
+        returns failed values and values left untried
+        """
+        failed: dict[K, V] = {}
+        parts = _halves(batch)
+        """Stack of parts to write, next one is last"""
+        failed_in_row = 0
+        while parts:
+            part = parts.pop()
+            try:
+                await self.flush_callback(list(part.values()))
+            except Exception as e:
+                if len(part) > 1:
+                    parts.extend(_halves(part))
+                    continue
+                [(key, value)] = part.items()
+                failed[key] = value
+                logger.warning(f"{self.name}: write of {key!r} failed: {e!r}")
+                failed_in_row += 1
+                if failed_in_row >= 2:
+                    break
+            else:
+                failed_in_row = 0
+
+        untried = {
+            key: value for part in reversed(parts) for key, value in part.items()
+        }
+        return failed, untried
+
+    def _retry(self, failed: dict[K, V], *, count_attempts: bool) -> None:
+        for key, value in failed.items():
+            if key in self._pending:
+                continue  # newer value replaces failed one
+            if len(self._pending) >= self.max_pending:
+                self._overflow()
+                continue
+            attempts = self._attempts.get(key, 0) + count_attempts
+            if attempts >= self.max_attempts:
+                self._attempts.pop(key, None)
+                self.stats.dropped += 1
+                logger.error(
+                    f"{self.name}: write of {key!r} dropped after {attempts} attempts"
+                )
+                continue
+            self._attempts[key] = attempts
+            self._pending[key] = value
+            self.stats.retried += 1
+
+    def _overflow(self) -> None:
+        self.stats.overflowed += 1
+        self._overflowed += 1
+
+
+def _halves[K, V](batch: dict[K, V]) -> list[dict[K, V]]:
+    """Second and first half of batch, to be popped from stack in order"""
+    items = list(batch.items())
+    middle = len(items) // 2
+    return [dict(items[middle:]), dict(items[:middle])]
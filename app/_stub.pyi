@@ -41,6 +41,10 @@ class I18nStub:
         def mood(**kwargs: Any) -> Literal['Календарь настроения']:
             ...
 
+        @staticmethod
+        def stats(**kwargs: Any) -> Literal['Статистика настроения']:
+            ...
+
         @staticmethod
         def notify(**kwargs: Any) -> Literal['Уведомления']:
             ...
@@ -63,6 +67,10 @@ class I18nStub:
         @staticmethod
         def button_wrong_user(**kwargs: Any) -> Literal['Не твоя кнопка']:
             ...
+
+        @staticmethod
+        def invalid_year(*, min: Any, max: Any, **kwargs: Any) -> Literal['🚫 Год должен быть от { $min } до { $max }']:
+            ...
     error = __Error()
 
     class __Mood:
@@ -100,6 +108,32 @@ class I18nStub:
     def mood_month(*, year: Any, month: Any, current_dmy: Any, **kwargs: Any) -> Literal['<tg-emoji emoji-id="5431897022456145283">📆</tg-emoji> Календарь настроения']:
         ...
 
+    class __MoodYear:
+
+        @staticmethod
+        def panel(*, year: Any, months: Any, **kwargs: Any) -> Literal['<tg-emoji emoji-id="5431897022456145283">📆</tg-emoji> Календарь настроения']:
+            ...
+
+        @staticmethod
+        def no_marks(**kwargs: Any) -> Literal['—']:
+            ...
+
+        @staticmethod
+        def open_button(*, year: Any, **kwargs: Any) -> Literal['🗓 { $year }']:
+            ...
+    mood_year = __MoodYear()
+
+    class __MoodStats:
+
+        @staticmethod
+        def panel(*, marked_days: Any, distribution: Any, streak: Any, best_streak: Any, average_7: Any, average_30: Any, **kwargs: Any) -> Literal['📊 <b>Статистика настроения</b>']:
+            ...
+
+        @staticmethod
+        def no_data(**kwargs: Any) -> Literal['—']:
+            ...
+    mood_stats = __MoodStats()
+
     class __MoodDay:
 
         @staticmethod
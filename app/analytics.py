@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import datetime
+import warnings
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, Iterator, Sequence
+
+import numpy as np
+import sqlalchemy as sa
+from dateutil.relativedelta import relativedelta
+
+from app.mood import Mood
+from app._database import orm
+
+
+if TYPE_CHECKING:
+    from app.database import Database
+
+
+__all__ = (
+    "MoodMatrix",
+    "load_mood_matrix",
+    "weekday_counts",
+    "weekday_correlation",
+    "monthly_distribution",
+    "monthly_mean",
+    "streaks",
+    "percentile_bands",
+)
+
+
+MOODS_COUNT = len(Mood)
+CHUNK_SIZE = 8192
+"""Users per chunk, bounds temporary arrays of per-day computations"""
+
+
+@dataclass(frozen=True, slots=True)
+class MoodMatrix:
+    """
+    Mood history of users as `(users, days)` matrix of `Mood.index`,
+    columns are consecutive dates from `start`, `0` is unmarked day
+    """
+
+    user_ids: np.ndarray
+    start: datetime.date
+    days: np.ndarray
+
+    def __post_init__(self):
+        assert self.days.shape == (len(self.user_ids), self.days.shape[1])
+
+    @property
+    def end(self) -> datetime.date:
+        return self.start + datetime.timedelta(days=self.days.shape[1] - 1)
+
+    @property
+    def weekdays(self) -> np.ndarray:
+        """Weekday of each column, Monday is `0`"""
+        return (np.arange(self.days.shape[1]) + self.start.weekday()) % 7
+
+    @property
+    def month_starts(self) -> np.ndarray:
+        """Column of first day of each month within matrix"""
+        starts = []
+        date = self.start.replace(day=1)
+        while date <= self.end:
+            starts.append(max(0, (date - self.start).days))
+            date += relativedelta(months=1)
+        return np.array(starts)
+
+    def row(self, user_id: int) -> np.ndarray:
+        index = np.searchsorted(self.user_ids, user_id)
+        if index == len(self.user_ids) or self.user_ids[index] != user_id:
+            raise KeyError(user_id)
+        return self.days[index]
+
+    def chunks(self, size: int = CHUNK_SIZE) -> Iterator[tuple[slice, np.ndarray]]:
+        for offset in range(0, len(self.user_ids), size):
+            rows = slice(offset, offset + size)
+            yield rows, self.days[rows]
+
+    @classmethod
+    def empty(
+        cls, user_ids: Iterable[int], start: datetime.date, end: datetime.date
+    ) -> MoodMatrix:
+        """Unmarked matrix of `start`..`end` inclusive"""
+        ids = np.unique(np.fromiter(user_ids, dtype=np.int64))
+        days = np.zeros((len(ids), (end - start).days + 1), dtype=np.uint8)
+        return cls(user_ids=ids, start=start, days=days)
+
+    def fill(self, rows: Sequence[tuple[int, int, int, bytes]]) -> None:
+        """
+        Write `(user_id, year, month, days)` rows of `mood` table,
+        rows of users out of matrix are skipped
+        """
+        if not rows or not len(self.user_ids):
+            return
+        row_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        indexes = np.searchsorted(self.user_ids, row_ids)
+        indexes[indexes == len(self.user_ids)] = 0
+        found = self.user_ids[indexes] == row_ids
+
+        columns = self.days.shape[1]
+        for (_, year, month, data), index, ok in zip(rows, indexes.tolist(), found):
+            if not ok:
+                continue
+            offset = (datetime.date(year, month, 1) - self.start).days
+            month_days = np.frombuffer(data, dtype=np.uint8)
+            first, last = max(0, -offset), min(len(month_days), columns - offset)
+            if first < last:
+                days = self.days[index]
+                days[offset + first : offset + last] = month_days[first:last]
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[tuple[int, int, int, bytes]],
+        start: datetime.date,
+        end: datetime.date,
+        user_ids: Iterable[int] | None = None,
+    ) -> MoodMatrix:
+        """
+        Build matrix of `start`..`end` inclusive
+        from `(user_id, year, month, days)` rows of `mood` table
+
+        :param user_ids: Matrix rows, by default users of `rows`
+        """
+        rows = list(rows)
+        if user_ids is None:
+            user_ids = [row[0] for row in rows]
+        matrix = cls.empty(user_ids, start, end)
+        matrix.fill(rows)
+        return matrix
+
+
+async def load_mood_matrix(
+    db: Database,
+    start: datetime.date,
+    end: datetime.date,
+    user_ids: Iterable[int] | None = None,
+    *,
+    batch_size: int = 10_000,
+) -> MoodMatrix:
+    """
+    Load `MoodMatrix` of `start`..`end` inclusive, all users by default;
+    matrix is allocated first and filled by `batch_size` rows,
+    so rows are never held all at once
+    """
+    first, last = start.replace(day=1), end.replace(day=1)
+    in_period = sa.tuple_(orm.MoodMonth.year, orm.MoodMonth.month).between(
+        sa.tuple_(first.year, first.month), sa.tuple_(last.year, last.month)
+    )
+    stmt = (
+        sa.select(
+            orm.MoodMonth.user_id,
+            orm.MoodMonth.year,
+            orm.MoodMonth.month,
+            orm.MoodMonth.days,
+        )
+        .where(in_period)
+        .execution_options(yield_per=batch_size)
+    )
+
+    async with db() as session:
+        if user_ids is None:
+            ids_stmt = (
+                sa.select(orm.MoodMonth.user_id)
+                .where(in_period)
+                .distinct()
+                .execution_options(yield_per=batch_size)
+            )
+            ids = [
+                np.fromiter(partition, dtype=np.int64, count=len(partition))
+                async for partition in (
+                    await session.stream_scalars(ids_stmt)
+                ).partitions()
+            ]
+            matrix = MoodMatrix.empty(
+                np.concatenate(ids) if ids else np.empty(0, dtype=np.int64),
+                start,
+                end,
+            )
+        else:
+            matrix = MoodMatrix.empty(user_ids, start, end)
+            stmt = stmt.where(orm.MoodMonth.user_id.in_(matrix.user_ids.tolist()))
+
+        async for partition in (await session.stream(stmt)).partitions():
+            matrix.fill(partition)  # type: ignore
+    return matrix
+
+
+def _by_weekday(matrix: MoodMatrix, days: np.ndarray) -> np.ndarray:
+    """`(users, weeks, 7)` view of days, padded with unmarked days"""
+    before = matrix.start.weekday()
+    after = -(before + days.shape[1]) % 7
+    padded = np.pad(days, ((0, 0), (before, after)))
+    return padded.reshape(len(days), -1, 7)
+
+
+def weekday_counts(matrix: MoodMatrix) -> np.ndarray:
+    """`(users, 7, len(Mood))` days count per weekday and `Mood.index`"""
+    result = np.zeros((len(matrix.user_ids), 7, MOODS_COUNT), dtype=np.int32)
+    for rows, days in matrix.chunks():
+        weeks = _by_weekday(matrix, days)
+        for mood in range(MOODS_COUNT):
+            result[rows, :, mood] = (weeks == mood).sum(axis=1)
+    # padding is not a day
+    result[:, :, Mood.UNSET.index] -= _padding_per_weekday(matrix)
+    return result
+
+
+def _padding_per_weekday(matrix: MoodMatrix) -> np.ndarray:
+    before = matrix.start.weekday()
+    after = -(before + matrix.days.shape[1]) % 7
+    padding = np.zeros(7, dtype=np.int32)
+    padding[:before] += 1
+    padding[7 - after :] += 1
+    return padding
+
+
+def weekday_correlation(matrix: MoodMatrix) -> np.ndarray:
+    """
+    `(users, 7)` Pearson correlation of `Mood.index` of marked days
+    with day being that weekday, positive means worse moods on weekday,
+    `nan` if undefined (e.g. no marks or all marks on single weekday)
+    """
+    result = np.empty((len(matrix.user_ids), 7))
+    for rows, days in matrix.chunks():
+        weeks = _by_weekday(matrix, days).astype(np.int64)
+        n_d = np.count_nonzero(weeks, axis=1)
+        s_d = weeks.sum(axis=1)
+        q_d = (weeks * weeks).sum(axis=1)
+        n, s, q = (x.sum(axis=1, keepdims=True) for x in (n_d, s_d, q_d))
+
+        numerator = n * s_d - n_d * s
+        denominator = np.sqrt((n * n_d - n_d * n_d) * (n * q - s * s), dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result[rows] = np.where(denominator > 0, numerator / denominator, np.nan)
+    return result
+
+
+def monthly_distribution(matrix: MoodMatrix) -> np.ndarray:
+    """`(users, months, len(Mood))` days count per month and `Mood.index`"""
+    starts = matrix.month_starts
+    result = np.empty((len(matrix.user_ids), len(starts), MOODS_COUNT), np.int32)
+    for rows, days in matrix.chunks():
+        for mood in range(MOODS_COUNT):
+            result[rows, :, mood] = np.add.reduceat(
+                days == mood, starts, axis=1, dtype=np.int32
+            )
+    return result
+
+
+def monthly_mean(matrix: MoodMatrix) -> np.ndarray:
+    """`(users, months)` average `Mood.index` of marked days, `nan` if none"""
+    starts = matrix.month_starts
+    result = np.empty((len(matrix.user_ids), len(starts)))
+    for rows, days in matrix.chunks():
+        total = np.add.reduceat(days, starts, axis=1, dtype=np.int32)
+        marked = np.add.reduceat(days > 0, starts, axis=1, dtype=np.int32)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result[rows] = total / marked
+    return result
+
+
+def streaks(matrix: MoodMatrix) -> tuple[np.ndarray, np.ndarray]:
+    """
+    `(current, best)` lengths of consecutive marked days of each user,
+    current streak is the one ending at `matrix.end`
+    """
+    current = np.empty(len(matrix.user_ids), dtype=np.int32)
+    best = np.empty(len(matrix.user_ids), dtype=np.int32)
+    position = np.arange(1, matrix.days.shape[1] + 1, dtype=np.int32)
+    for rows, days in matrix.chunks():
+        # run length = position - position of last unmarked day
+        last_unmarked = np.where(days > 0, 0, position)
+        np.maximum.accumulate(last_unmarked, axis=1, out=last_unmarked)
+        run = position - last_unmarked
+        current[rows] = run[:, -1] if run.size else 0
+        best[rows] = run.max(axis=1, initial=0)
+    return current, best
+
+
+def percentile_bands(
+    values: np.ndarray, percentiles: Sequence[float] = (10, 25, 50, 75, 90)
+) -> np.ndarray:
+    """
+    `(len(percentiles), columns)` percentiles of `(users, columns)` values
+    across users ignoring `nan`, e.g. of `monthly_mean`
+    """
+    with warnings.catch_warnings():
+        # all-nan columns are expected, e.g. month without marks
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanpercentile(values, percentiles, axis=0)
@@ -17,6 +17,30 @@ class AppConfig(BaseSettings):
         validation_alias=AliasChoices("_compose_postgres_url")
     )
     locale: Literal["ru"] = "ru"
+    user_cache_size: int | None = 10_000
+    user_cache_ttl: float | None = 3600
+    mood_cache_size: int | None = 10_000
+    write_behind_max_size: int = 500
+    write_behind_interval: float = 1.0
+    write_behind_max_pending: int = 100_000
+    mood_notify_concurrency: int = 20
+    send_global_rate: float = 30
+    send_primary_share: float = Field(0.5, gt=0, lt=1)
+    send_chat_interval: float = 1.0
+    send_group_interval: float = 3.0
+    send_retry_attempts: int = 3
+    metrics_port: int | None = None
+    metrics_host: str = "127.0.0.1"
+    webhook_url: str | None = None
+    webhook_path: str = "/webhook"
+    webhook_secret: Secret[str] | None = None
+    webhook_host: str = "127.0.0.1"
+    webhook_port: int = 8080
+    webhook_concurrency: int = 100
+    anti_flood_window: float = 3.0
+    anti_flood_burst: int = 6
+    redis_url: Secret[str] | None = None
+    fsm_ttl: int | None = 86_400
 
     model_config = SettingsConfigDict(
         extra="ignore", frozen=True, populate_by_name=True
@@ -1,13 +1,21 @@
-from app._database.database import Database
-from app._database.models import UserConfig, MoodMonth, MoodConfig, UserLastMessage
+from app._database.database import Database, DueNotification
+from app._database.models import (
+    UserConfig,
+    MoodMonth,
+    MoodConfig,
+    MoodStats,
+    UserLastMessage,
+)
 from app._database import orm
 
 
 __all__ = (
     "Database",
+    "DueNotification",
     "UserConfig",
     "MoodMonth",
     "MoodConfig",
+    "MoodStats",
     "UserLastMessage",
     "orm",
 )
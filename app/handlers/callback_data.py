@@ -1,5 +1,7 @@
-from typing import Any, Literal, Self
+from types import NoneType, UnionType
+from typing import Any, Callable, ClassVar, Literal, Self, Union, get_args, get_origin
 
+from aiogram.filters.callback_data import MAX_CALLBACK_LENGTH
 from aiogram.filters.callback_data import CallbackData as _CallbackData
 from aiogram.types import CallbackQuery, InlineKeyboardButton
 
@@ -11,7 +13,93 @@ from app.mood import _MoodMonthMixin
 from app.handlers.filters import ctx_and_f
 
 
+_MISSING: Any = object()
+
+type FieldEncoder = Callable[[Any], str | None]
+"""Packed value, `None` if value is not valid for field as is"""
+
+
+def _field_encoder(annotation: Any) -> FieldEncoder:
+    if annotation is int:
+        return lambda value: str(value) if type(value) is int else None
+    if annotation is str:
+        return lambda value: value if type(value) is str else None
+    if annotation is bool:
+        return lambda value: ("1" if value else "0") if type(value) is bool else None
+    if annotation is NoneType:
+        return lambda value: "" if value is None else None
+    origin = get_origin(annotation)
+    if origin is Literal and all(type(arg) is str for arg in get_args(annotation)):
+        choices = frozenset(get_args(annotation))
+        return lambda value: value if type(value) is str and value in choices else None
+    if origin in (Union, UnionType):
+        encoders = [_field_encoder(arg) for arg in get_args(annotation)]
+
+        def encode_union(value: Any) -> str | None:
+            for encode in encoders:
+                if (packed := encode(value)) is not None:
+                    return packed
+            return None
+
+        return encode_union
+    return lambda value: None
+
+
+class CallbackCodec:
+    """
+    Packs field values of `CallbackData` class positionally without pydantic,
+    `None` is returned for values it doesn't handle, so caller falls back to pydantic
+    """
+
+    __slots__ = ("prefix", "separator", "fields")
+
+    def __init__(self, cls: type[_CallbackData]) -> None:
+        self.prefix = cls.__prefix__
+        self.separator = cls.__separator__
+        self.fields = tuple(
+            (
+                name,
+                _field_encoder(field.annotation),
+                _MISSING
+                if field.is_required() or field.default_factory is not None
+                else field.default,
+            )
+            for name, field in cls.model_fields.items()
+        )
+
+    def pack(self, values: dict[str, Any]) -> str | None:
+        parts = [self.prefix]
+        for name, encode, _ in self.fields:
+            if (packed := encode(values[name])) is None:
+                return None
+            parts.append(packed)
+        return self._join(parts)
+
+    def pack_merge(self, obj: _CallbackData, args: dict[str, Any]) -> str | None:
+        """Fields of `args`, then of `obj`, then defaults"""
+        parts = [self.prefix]
+        for name, encode, default in self.fields:
+            value = args.get(name, _MISSING)
+            if value is _MISSING:
+                value = obj.__dict__.get(name, default)
+            if value is _MISSING or (packed := encode(value)) is None:
+                return None
+            parts.append(packed)
+        return self._join(parts)
+
+    def _join(self, parts: list[str]) -> str | None:
+        packed = self.separator.join(parts)
+        if (
+            packed.count(self.separator) != len(self.fields)
+            or len(packed.encode()) > MAX_CALLBACK_LENGTH
+        ):
+            return None  # let pydantic pack raise
+        return packed
+
+
 class CallbackData(_CallbackData, prefix="*"):
+    __codec__: ClassVar[CallbackCodec]
+
     def __init_subclass__(cls, **kwargs: Any) -> None:
         if "prefix" not in kwargs:
             kwargs["prefix"] = "".join(
@@ -20,6 +108,11 @@ class CallbackData(_CallbackData, prefix="*"):
 
         return super().__init_subclass__(**kwargs)
 
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs: Any) -> None:
+        super().__pydantic_init_subclass__(**kwargs)
+        cls.__codec__ = CallbackCodec(cls)
+
     @classmethod
     def merge(cls, obj: CallbackData, **args):
         return cls.model_validate({**obj.model_dump(), **args}, extra="ignore")
@@ -27,6 +120,34 @@ class CallbackData(_CallbackData, prefix="*"):
     def update(self, **args):
         return self.model_validate({**self.model_dump(), **args}, extra="ignore")
 
+    @classmethod
+    def pack_merge(cls, obj: CallbackData, **args) -> str:
+        """`merge(obj, **args).pack()` without building model"""
+        if (packed := cls.__codec__.pack_merge(obj, args)) is None:
+            return cls.merge(obj, **args).pack()
+        return packed
+
+    def pack_update(self, **args) -> str:
+        """`update(**args).pack()` without building model"""
+        return self.pack_merge(self, **args)
+
+    def pack(self) -> str:
+        # `unpack` is left to pydantic, its input comes from users
+        if (packed := self.__codec__.pack(self.__dict__)) is None:
+            return super().pack()
+        return packed
+
+    def pack_template(self, *fields: str) -> str:
+        """`pack` result with `{field}` placeholders of `fields` for `str.format`"""
+        parts = [
+            part.replace("{", "{{").replace("}", "}}")
+            for part in self.pack().split(self.__separator__)
+        ]
+        for index, name in enumerate(type(self).model_fields, 1):
+            if name in fields:
+                parts[index] = f"{{{name}}}"
+        return self.__separator__.join(parts)
+
 
 class OwnedCallbackData(CallbackData, prefix="*"):
     user_id: int
@@ -60,6 +181,10 @@ class DeleteMessage(OwnedCallbackData):
     pass
 
 
+class MoodYearCallback(OwnedCallbackData):
+    year: int
+
+
 class MoodMonthCallback(OwnedCallbackData, _MoodMonthMixin):
     year: int
     month: int
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any
 import uvloop
 
@@ -43,28 +44,83 @@ class MiddlewareData(_MiddlewareData):
     loop: uvloop.Loop
 
 
-class AntiFlood(BaseMiddleware, metaclass=Singleton):
-    MESSAGE_THRESHOLD = 0.500
+@dataclass(slots=True)
+class FloodWindow:
+    """Sliding window counter: events of current and previous fixed windows"""
+
+    start: float
+    previous: int = 0
+    current: int = 0
+    skipped: int = 0
+    """Events skipped since user was last let through"""
+
+    def hit(self, now: float, window: float, burst: int) -> bool:
+        if (periods := int((now - self.start) // window)) > 0:
+            self.previous = self.current if periods == 1 else 0
+            self.current = 0
+            self.start += periods * window
+        # previous window events are assumed evenly spread
+        weight = 1 - (now - self.start) / window
+        # tolerance keeps float error from skipping event right at the limit
+        if self.previous * weight + self.current + 1 > burst + 1e-9:
+            self.skipped += 1
+            return False
+        self.current += 1
+        return True
+
 
-    def __init__(self):
-        self.users: dict[int, float] = {}
+class AntiFlood(BaseMiddleware, metaclass=Singleton):
+    """
+    Lets through at most `burst` events of user within sliding `window` seconds,
+    idle users are forgotten after two windows
+
+    :param max_users: Users tracked at once, least recently active are dropped
+    """
+
+    def __init__(self, window: float, burst: int, max_users: int = 100_000):
+        self.window = window
+        self.burst = burst
+        self.users = utils.LRUCache[int, FloodWindow](
+            max_users, ttl=2 * window, on_evict=self.on_evict
+        )
+        self.skipped = 0
+        self._next_expire = 0.0
+
+    def on_evict(self, user_id: int, state: FloodWindow):
+        if state.skipped:
+            self.report(user_id, state)
+
+    def report(self, user_id: int, state: FloodWindow):
+        logger.info(f"Got flood from {user_id}, {state.skipped} events skipped")
+        state.skipped = 0
 
     async def __call__(self, handler, event, data: MiddlewareData):  # type: ignore
         event_context = data.get("event_context")
-        loop = data["loop"]
-        user_id = getattr(event_context, "user_id", None) or -1
-        is_from_admin = user_id in data["app_cfg"].owners
-        last_time = self.users.get(user_id) or 0
-
-        if not is_from_admin and (last_time + self.MESSAGE_THRESHOLD > loop.time()):
-            logger.info(f"Got flood from {user_id}, event skipped")
-            self.users[user_id] = (last_time or loop.time()) + self.MESSAGE_THRESHOLD
-            return
-        try:
+        user_id = getattr(event_context, "user_id", None)
+        if user_id is None or user_id in data["app_cfg"].owners:
             return await handler(event, data)  # type: ignore
-        finally:
-            self.users[user_id] = loop.time()
 
-
-anti_flood_mw = dp["anti_flood_mw"] = AntiFlood()
-main_router.message.middleware.register(anti_flood_mw)
+        now = data["loop"].time()
+        if now >= self._next_expire:
+            self._next_expire = now + 60
+            self.users.expire()
+
+        if (state := self.users.get(user_id)) is None:
+            state = FloodWindow(start=now)
+        # written on every event, so only idle users expire
+        self.users[user_id] = state
+        if not state.hit(now, self.window, self.burst):
+            self.skipped += 1
+            return
+        if state.skipped:
+            self.report(user_id, state)
+        return await handler(event, data)  # type: ignore
+
+
+def setup_anti_flood(app_cfg: AppConfig) -> AntiFlood:
+    anti_flood_mw = dp["anti_flood_mw"] = AntiFlood(
+        window=app_cfg.anti_flood_window, burst=app_cfg.anti_flood_burst
+    )
+    main_router.message.middleware.register(anti_flood_mw)
+    main_router.callback_query.middleware.register(anti_flood_mw)
+    return anti_flood_mw
@@ -2,15 +2,14 @@ from __future__ import annotations
 
 import asyncio
 import math
+import time
 import datetime
 import re
-from typing import Any, Literal, TypedDict, Unpack, cast
-from contextlib import asynccontextmanager, suppress
-from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Literal, Unpack, cast
+from contextlib import asynccontextmanager
 from dateutil.relativedelta import relativedelta
 
-from apscheduler.jobstores.base import JobLookupError
-
 from aiogram import F, Router, flags
 from aiogram.types import (
     Message,
@@ -30,10 +29,19 @@ from pydantic import BaseModel, field_validator
 
 from app import utils
 from app import main
-from app.main import dp, mood_router
-from app.mood import Mood, date_to_dict
+from app import metrics
+from app.main import admin_router, dp, mood_router
+from app.mood import Mood, date_to_dict, dominant_mood
 from app.i18n import I18nContext
-from app.database import MoodConfig, UserConfig
+from app.ratelimit import bulk_sends
+from app.database import (
+    Database,
+    DueNotification,
+    MoodConfig,
+    MoodMonth,
+    UserConfig,
+    UserLastMessage,
+)
 
 from app.handlers.common import Handler
 from app.handlers.middlewares import MiddlewareData
@@ -49,6 +57,7 @@ from app.handlers.callback_data import (
     MoodNotifySwitchState,
     OpenMoodDay,
     MoodMonthCallback,
+    MoodYearCallback,
     OwnedCallbackData,
     empty_callback_data,
 )
@@ -56,6 +65,25 @@ from app.handlers.callback_data import (
 
 logger = utils.get_logger()
 
+notify_lag = metrics.Histogram(
+    "mood_notify_lag_seconds",
+    "Delay between notification due time and its delivery",
+    buckets=(1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+notify_send_latency = metrics.Histogram(
+    "mood_notify_send_seconds",
+    "Duration of notification send, including chat cooldown and rate limit waits",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+notify_due = metrics.Counter(
+    "mood_notify_due_total", "Notifications selected by notify ticks"
+)
+notify_outcomes = metrics.Counter(
+    "mood_notify_total",
+    "Processed notifications by outcome",
+    labels=("outcome",),
+)
+
 
 class MoodMonthHandler(Handler[Message | CallbackQuery]):
     @classmethod
@@ -93,13 +121,11 @@ class MoodMonthHandler(Handler[Message | CallbackQuery]):
                         text=f"{day}. {mood.emoji}"
                         if mood is not Mood.UNSET
                         else str(day),
-                        callback_data=(
-                            OpenMoodDay.merge(cd, day=day)
-                            if mark == -1
-                            else MarkMoodDay.merge(
-                                cd, day=day, value=mark, go_to="month"
-                            )
-                        ).pack(),
+                        callback_data=OpenMoodDay.pack_merge(cd, day=day)
+                        if mark == -1
+                        else MarkMoodDay.pack_merge(
+                            cd, day=day, value=mark, go_to="month"
+                        ),
                     )
                     for day, mood in enumerate(mood_month.days, 1)
                 ),
@@ -123,9 +149,9 @@ class MoodMonthHandler(Handler[Message | CallbackQuery]):
         row += [
             InlineKeyboardButton(
                 text=f"« {cls.str_month(data['i18n'], month=workflow_date.month).lower()[:3:]}",
-                callback_data=MoodMonthCallback.merge(
+                callback_data=MoodMonthCallback.pack_merge(
                     cd, year=workflow_date.year, month=workflow_date.month
-                ).pack(),
+                ),
             )
         ]
 
@@ -136,9 +162,9 @@ class MoodMonthHandler(Handler[Message | CallbackQuery]):
         row += [
             InlineKeyboardButton(
                 text="✏️" + ["🗑", *map(str, list(Mood)[1:]), ""][mark],
-                callback_data=MoodMonthCallback.merge(
+                callback_data=MoodMonthCallback.pack_merge(
                     cd, mark=next_mark, alert_marker=True
-                ).pack(),
+                ),
             )
         ]
 
@@ -146,12 +172,20 @@ class MoodMonthHandler(Handler[Message | CallbackQuery]):
         row += [
             InlineKeyboardButton(
                 text=f"{cls.str_month(data['i18n'], month=workflow_date.month).lower()[:3:]} »",
-                callback_data=MoodMonthCallback.merge(
+                callback_data=MoodMonthCallback.pack_merge(
                     cd, year=workflow_date.year, month=workflow_date.month
-                ).pack(),
+                ),
             )
         ]
         kb += [row]
+        kb += [
+            [
+                InlineKeyboardButton(
+                    text=data["i18n"].mood_year.open_button(year=str(cd.year)),
+                    callback_data=MoodYearCallback.pack_merge(cd),
+                )
+            ]
+        ]
         return {"text": text, "reply_markup": InlineKeyboardMarkup(inline_keyboard=kb)}
 
     async def handle(self) -> Any:
@@ -181,6 +215,90 @@ class MoodMonthHandler(Handler[Message | CallbackQuery]):
             await m.reply(**panel)
 
 
+class MoodYearHandler(Handler[Message | CallbackQuery]):
+    @classmethod
+    def register(cls) -> None:
+        mood_router.message.register(
+            cls,
+            or_f(
+                Command("mood", magic=F.args.regexp(r"\d{4}", mode="fullmatch")),
+                F.text.regexp(r"муд +\d{4}", flags=re.IGNORECASE, mode="fullmatch"),
+            ),
+        )
+        mood_router.callback_query.register(cls, MoodYearCallback.filter())
+
+    @classmethod
+    async def panel(cls, data: MiddlewareData):
+        cd = data["callback_data"]
+        assert isinstance(cd, MoodYearCallback)
+        i18n = data["i18n"]
+        year_counts = await data["db"].get_mood_year(cd.user_id, cd.year)
+
+        lines: list[str] = []
+        buttons: list[InlineKeyboardButton] = []
+        for month, counts in enumerate(year_counts, 1):
+            month_name = MoodMonthHandler.str_month(i18n, month=month)
+            dominant = dominant_mood(counts)
+            marks = " ".join(
+                f"{mood.emoji}{counts[mood.index]}"
+                for mood in list(Mood)[1:]
+                if counts[mood.index]
+            )
+            lines += [
+                f"{dominant.emoji or '▫️'} <b>{month_name}</b>: "
+                + (marks or i18n.mood_year.no_marks())
+            ]
+            buttons += [
+                InlineKeyboardButton(
+                    text=f"{month_name.lower()[:3:]} {dominant.emoji}".strip(),
+                    callback_data=MoodMonthCallback(
+                        user_id=cd.user_id, year=cd.year, month=month
+                    ).pack(),
+                )
+            ]
+
+        text = i18n.mood_year.panel(year=str(cd.year), months="\n".join(lines))
+        kb = [
+            *utils.chunks(buttons, 3),
+            [
+                InlineKeyboardButton(
+                    text=f"« {cd.year - 1}",
+                    callback_data=cd.pack_update(year=cd.year - 1),
+                ),
+                InlineKeyboardButton(
+                    text=f"{cd.year + 1} »",
+                    callback_data=cd.pack_update(year=cd.year + 1),
+                ),
+            ],
+        ]
+        return {"text": text, "reply_markup": InlineKeyboardMarkup(inline_keyboard=kb)}
+
+    async def handle(self) -> Any:
+        m, call = utils.split_event(self.event)
+        if not call:
+            # command may be sent as `/mood@bot_username 2025`
+            year = int(re.findall(r"\d{4}", cast(str, m.text))[-1])
+            self.data["callback_data"] = MoodYearCallback(
+                user_id=self.event.from_user.id, year=year
+            )
+
+        if not datetime.MINYEAR < self.cd.year < datetime.MAXYEAR:
+            error = self.data["i18n"].error.invalid_year(
+                min=str(datetime.MINYEAR + 1), max=str(datetime.MAXYEAR - 1)
+            )
+            if call:
+                await call.answer(error, show_alert=True)
+            else:
+                await m.reply(error)
+            return
+
+        panel = await self.panel(self.data)
+        if call:
+            await m.edit_text(**panel)
+        else:
+            await m.reply(**panel)
+
+
 class InputNoteContext(BaseModel):
     callback_data: MoodDayNote
     event: CallbackQuery
@@ -378,7 +496,7 @@ class MoodDayHandler(Handler[Message | CallbackQuery]):
                         [
                             InlineKeyboardButton(
                                 text=i18n.close(),
-                                callback_data=DeleteMessage.merge(any_cd).pack(),
+                                callback_data=DeleteMessage.pack_merge(any_cd),
                             )
                         ]
                     ]
@@ -413,7 +531,7 @@ class MoodDayHandler(Handler[Message | CallbackQuery]):
         )
         input_data = InputNoteContext(event=call, callback_data=cd)
         await data["state"].update_data(
-            edit_note=input_data.model_dump(exclude_none=True)
+            edit_note=input_data.model_dump(mode="json", exclude_none=True)
         )
         await data["state"].set_state(
             input_state.EDIT_NOTE if cd.action == "edit" else input_state.EXTEND_NOTE
@@ -432,7 +550,7 @@ class MoodDayHandler(Handler[Message | CallbackQuery]):
         kb = [
             [
                 InlineKeyboardButton(
-                    text=i18n.cancel(), callback_data=OpenMoodDay.merge(cd).pack()
+                    text=i18n.cancel(), callback_data=OpenMoodDay.pack_merge(cd)
                 )
             ],
         ]
@@ -451,12 +569,12 @@ class MoodDayHandler(Handler[Message | CallbackQuery]):
             [
                 InlineKeyboardButton(
                     text=i18n.mood_day.delete_note(),
-                    callback_data=cd.update(action="delete").pack(),
+                    callback_data=cd.pack_update(action="delete"),
                 )
             ],
             [
                 InlineKeyboardButton(
-                    text=i18n.cancel(), callback_data=OpenMoodDay.merge(cd).pack()
+                    text=i18n.cancel(), callback_data=OpenMoodDay.pack_merge(cd)
                 )
             ],
         ]
@@ -519,9 +637,9 @@ class MoodDayHandler(Handler[Message | CallbackQuery]):
                         [
                             InlineKeyboardButton(
                                 text=f"{str(mood)} {data['i18n'].get(f'mood-{mood.name.lower()}')}",
-                                callback_data=MarkMoodDay.merge(
+                                callback_data=MarkMoodDay.pack_merge(
                                     cd, value=int(mood), go_to="day"
-                                ).pack(),
+                                ),
                             )
                             for mood in list(Mood)[1:]
                         ],
@@ -530,9 +648,9 @@ class MoodDayHandler(Handler[Message | CallbackQuery]):
                     [
                         InlineKeyboardButton(
                             text=i18n.mood.unset(),
-                            callback_data=MarkMoodDay.merge(
+                            callback_data=MarkMoodDay.pack_merge(
                                 cd, value=int(Mood.UNSET), go_to="day"
-                            ).pack(),
+                            ),
                         )
                     ],
                 ]
@@ -544,9 +662,9 @@ class MoodDayHandler(Handler[Message | CallbackQuery]):
                                 text=(
                                     str(mood) or i18n.get(f"mood-{mood.name.lower()}")
                                 ),
-                                callback_data=MarkMoodDay.merge(
+                                callback_data=MarkMoodDay.pack_merge(
                                     cd, value=int(mood), go_to="day"
-                                ).pack(),
+                                ),
                             )
                             for mood in (*list(Mood)[1:],)  # Mood.UNSET)
                         ],
@@ -559,18 +677,18 @@ class MoodDayHandler(Handler[Message | CallbackQuery]):
                     [
                         InlineKeyboardButton(
                             text=i18n.mood_day.edit_note(),
-                            callback_data=MoodDayNote.merge(cd, action="edit").pack(),
+                            callback_data=MoodDayNote.pack_merge(cd, action="edit"),
                         ),
                         InlineKeyboardButton(
                             # text=i18n.mood_day.delete_note(),
                             text="🗑",
-                            callback_data=MoodDayNote.merge(
+                            callback_data=MoodDayNote.pack_merge(
                                 cd, action="delete-warning"
-                            ).pack(),
+                            ),
                         ),
                         InlineKeyboardButton(
                             text=i18n.mood_day.extend_note(),
-                            callback_data=MoodDayNote.merge(cd, action="extend").pack(),
+                            callback_data=MoodDayNote.pack_merge(cd, action="extend"),
                         ),
                     ],
                 ]
@@ -579,7 +697,7 @@ class MoodDayHandler(Handler[Message | CallbackQuery]):
                     [
                         InlineKeyboardButton(
                             text=i18n.mood_day.add_note(),
-                            callback_data=MoodDayNote.merge(cd, action="edit").pack(),
+                            callback_data=MoodDayNote.pack_merge(cd, action="edit"),
                         )
                     ]
                 ]
@@ -587,18 +705,14 @@ class MoodDayHandler(Handler[Message | CallbackQuery]):
             [
                 InlineKeyboardButton(
                     text="«",
-                    callback_data=OpenMoodDay.merge(
-                        cd, **date_to_dict(prev_day)
-                    ).pack(),
+                    callback_data=OpenMoodDay.pack_merge(cd, **date_to_dict(prev_day)),
                 ),
                 InlineKeyboardButton(
-                    text=i18n.back(), callback_data=MoodMonthCallback.merge(cd).pack()
+                    text=i18n.back(), callback_data=MoodMonthCallback.pack_merge(cd)
                 ),
                 InlineKeyboardButton(
                     text="»",
-                    callback_data=OpenMoodDay.merge(
-                        cd, **date_to_dict(next_day)
-                    ).pack(),
+                    callback_data=OpenMoodDay.pack_merge(cd, **date_to_dict(next_day)),
                 ),
             ],
         ]
@@ -624,6 +738,12 @@ class MarkMoodDayHandler(Handler[CallbackQuery]):
             new_value = Mood.UNSET
         mood_month.save_mood(cd.day, new_value)
         await mood_month.merge()
+        # before telegram calls: failed edit must not skip stats of saved mood
+        await utils.suppress_error(
+            self.data["db"].update_mood_stats(
+                cd.user_id, cd.date, current_value, new_value
+            )
+        )
 
         if cd.go_to == "day" or cd.go_to == "from_notify":
             self.data["callback_data"] = OpenMoodDay.merge(cd)
@@ -635,19 +755,137 @@ class MarkMoodDayHandler(Handler[CallbackQuery]):
         await self.event.message.edit_text(**panel)  # type: ignore
 
 
-class NotifyJobData(TypedDict):
-    user_id: int
-    date: datetime.date
-    is_current_day: bool
+class MoodStatsHandler(Handler[Message]):
+    @classmethod
+    def register(cls) -> None:
+        mood_router.message.register(cls, Command("stats", magic=~F.args))
+
+    @staticmethod
+    def rolling_average(
+        months: list[MoodMonth], today: datetime.date, days: int
+    ) -> float | None:
+        """Average `Mood.index` of marked days in last `days` days up to `today`"""
+        moods = [
+            int(mood)
+            for mood_month in months
+            for day, mood in enumerate(mood_month.days, 1)
+            if mood is not Mood.UNSET
+            and 0 <= (today - mood_month.date.replace(day=day)).days < days
+        ]
+        return sum(moods) / len(moods) if moods else None
+
+    @classmethod
+    async def panel(cls, data: MiddlewareData) -> dict[str, Any]:
+        i18n = data["i18n"]
+        db = data["db"]
+        user_config = data["user_config"]
+        today = user_config.current_time.date()
+        stats = await db.get_mood_stats(user_config.user_id)
+
+        months = [
+            mood_month
+            async for mood_month in db.get_mood_range(
+                user_config.user_id, today - datetime.timedelta(days=29), today
+            )
+        ]
+
+        def format_average(days: int):
+            average = cls.rolling_average(months, today, days)
+            if average is None:
+                return i18n.mood_stats.no_data()
+            return f"{Mood.from_index(round(average)).emoji} {average:.1f}"
+
+        distribution = "\n".join(
+            f"{mood.emoji} {i18n.get(f'mood-{mood.name.lower()}')}: {stats.counts[mood.index]}"
+            for mood in list(Mood)[1:]
+        )
+        text = i18n.mood_stats.panel(
+            marked_days=str(stats.marked_days),
+            distribution=distribution,
+            streak=str(stats.current_streak(today)),
+            best_streak=str(stats.best_streak),
+            average_7=format_average(7),
+            average_30=format_average(30),
+        )
+        return {"text": text}
+
+    async def handle(self):
+        panel = await self.panel(self.data)
+        method = (
+            self.event.answer if self.event.chat.type == "private" else self.event.reply
+        )
+        await method(**panel)
+
+
+@admin_router.message(Command("rebuild_mood_stats"))
+async def rebuild_mood_stats_command(m: Message, db: Database):
+    loading = await m.answer("...")
+    count = await db.rebuild_all_mood_stats()
+    await loading.edit_text(f"Mood stats rebuilt for <code>{count}</code> users")
+
+
+@dataclass(frozen=True, slots=True)
+class NotifyPanelTemplate:
+    """Notification panel parts shared by users of locale"""
+
+    i18n: I18nContext
+    buttons: tuple[tuple[tuple[str, str], ...], ...]
+    """Rows of `(text, callback data template)`"""
+
+    @classmethod
+    def build(cls, locale: str) -> NotifyPanelTemplate:
+        i18n = cast(I18nContext, dp["i18n_middleware"].new_context(locale, {}))
+        date_fields = "user_id", "year", "month", "day"
+        moods = [
+            (
+                f"{str(mood)} {i18n.get(f'mood-{mood.name.lower()}')}",
+                MarkMoodDay(
+                    user_id=0,
+                    value=int(mood),
+                    year=1,
+                    month=1,
+                    day=1,
+                    go_to="from_notify",
+                ).pack_template(*date_fields),
+            )
+            for mood in list(Mood)[1:]
+        ]
+        close = i18n.close(), DeleteMessage(user_id=0).pack_template("user_id")
+        return cls(
+            i18n=i18n,
+            buttons=(*map(tuple, utils.chunks(moods, 2)), (close,)),
+        )
+
+    def keyboard(self, user_id: int, date: datetime.date) -> dict[str, Any]:
+        """`InlineKeyboardMarkup` data, validated by the method it is passed to"""
+        values = dict(user_id=user_id, year=date.year, month=date.month, day=date.day)
+        return dict(
+            inline_keyboard=[
+                [
+                    dict(text=text, callback_data=data.format_map(values))
+                    for text, data in row
+                ]
+                for row in self.buttons
+            ]
+        )
 
 
 # @flags.UNIQE_STATE
 class MoodNotifyConfigurator(Handler[Message | CallbackQuery]):
     router = mood_router.include_router(Router())
-    locks = defaultdict[str, asyncio.Lock](asyncio.Lock)
+    locks = utils.LockPool()
+    chat_cooldowns = utils.LRUCache[int | str, float](100_000)
+    """`chat_id`: loop time when next notification may be sent"""
+    chat_cooldown = 3.0
+    tick_job_id = "mood_notify_tick"
+    notify_semaphore: asyncio.Semaphore
+    notify_tasks = set[asyncio.Task]()
+    notify_panels: dict[str, NotifyPanelTemplate] = {}
+    """`locale`: `NotifyPanelTemplate`"""
 
     @classmethod
     def register(cls):
+        cls.router.startup.register(cls.on_startup)
         cls.router.message.middleware(cls.middleware)  # type: ignore
         cls.router.callback_query.middleware(cls.middleware)  # type: ignore
 
@@ -697,7 +935,9 @@ class MoodNotifyConfigurator(Handler[Message | CallbackQuery]):
         state: FSMContext,
         event: Message,
     ):
-        await state.update_data(panel_msg=event.model_dump(exclude_none=True))
+        await state.update_data(
+            panel_msg=event.model_dump(mode="json", exclude_none=True)
+        )
 
     @classmethod
     async def clear_state(cls, state: FSMContext):
@@ -766,34 +1006,34 @@ class MoodNotifyConfigurator(Handler[Message | CallbackQuery]):
                 [
                     InlineKeyboardButton(
                         text=i18n.turn_off(),
-                        callback_data=MoodNotifySwitchState.merge(cd_ctx).pack(),
+                        callback_data=MoodNotifySwitchState.pack_merge(cd_ctx),
                     )
                 ],
                 [
                     InlineKeyboardButton(
                         text=i18n.send_here(),
-                        callback_data=MoodNotifySetChat.merge(
+                        callback_data=MoodNotifySetChat.pack_merge(
                             cd_ctx, chat_id=m.chat.id
-                        ).pack(),
+                        ),
                     )
                     if not chat
                     else InlineKeyboardButton(
                         text=i18n.send_pm(),
-                        callback_data=MoodNotifySetChat.merge(
+                        callback_data=MoodNotifySetChat.pack_merge(
                             cd_ctx, chat_id=None
-                        ).pack(),
+                        ),
                     )
                 ],
                 [
                     InlineKeyboardButton(
                         text=i18n.get(f"mood_notify-notify_{invert_day_type}_day"),
-                        callback_data=MoodNotifySwitchDayType.merge(cd_ctx).pack(),
+                        callback_data=MoodNotifySwitchDayType.pack_merge(cd_ctx),
                     )
                 ],
                 [
                     InlineKeyboardButton(
                         text=f"{cfg.notify_time_emoji} {cfg.notify_time_str} ({i18n.change()})",
-                        callback_data=MoodNotifyChoiceTime.merge(cd_ctx).pack(),
+                        callback_data=MoodNotifyChoiceTime.pack_merge(cd_ctx),
                     )
                 ],
             ]
@@ -803,7 +1043,7 @@ class MoodNotifyConfigurator(Handler[Message | CallbackQuery]):
                 [
                     InlineKeyboardButton(
                         text=i18n.turn_on(),
-                        callback_data=MoodNotifySwitchState.merge(cd_ctx).pack(),
+                        callback_data=MoodNotifySwitchState.pack_merge(cd_ctx),
                     )
                 ],
             ]
@@ -908,43 +1148,81 @@ class MoodNotifyConfigurator(Handler[Message | CallbackQuery]):
     @classmethod
     @asynccontextmanager
     async def notify_job_lock(cls, chat_id: int | str):
-        chat_lock_key = f"chat_lock:{chat_id}"
+        """
+        Serialize notifications to chat, keeping `chat_cooldown` between them;
+        cooldown is waited by the next sender, not by the one that finished.
+        `notify_semaphore` is taken after the waits, so waiting senders
+        don't hold concurrency from other chats
+        """
+        loop = asyncio.get_running_loop()
+        async with cls.locks[f"chat_lock:{chat_id}"]:
+            if (delay := (cls.chat_cooldowns.get(chat_id) or 0.0) - loop.time()) > 0:
+                await asyncio.sleep(delay)
+            try:
+                async with cls.notify_semaphore:
+                    yield
+            finally:
+                cls.chat_cooldowns[chat_id] = loop.time() + cls.chat_cooldown
 
-        async with cls.locks[chat_lock_key]:
-            yield
+    @classmethod
+    async def on_startup(cls):
+        cls.notify_semaphore = asyncio.Semaphore(dp["app_cfg"].mood_notify_concurrency)
+        scheduler = dp["scheduler"]
+        if scheduler.get_job(cls.tick_job_id) is None:
+            scheduler.add_job(
+                notify_tick_proxy,
+                kwargs=dict(since=datetime.datetime.now(datetime.UTC)),
+                id=cls.tick_job_id,
+                trigger="cron",
+                second=0,
+                coalesce=True,
+                max_instances=1,
+                misfire_grace_time=None,
+            )
 
-        await asyncio.sleep(3)
+    @classmethod
+    async def notify_tick(cls, since: datetime.datetime):
+        """
+        Send notifications due within `(since, now]`, one job for all users;
+        after downtime only the last day is caught up
+        """
+        db = dp["db"]
+        until = datetime.datetime.now(datetime.UTC)
+        since = max(since, until - relativedelta(days=1))
+        due = await db.get_due_notifications(since, until)
+        dp["scheduler"].modify_job(cls.tick_job_id, kwargs=dict(since=until))
+        notify_due.inc(len(due))
+
+        for notification in due:
+            task = asyncio.create_task(cls.notify(notification))
+            cls.notify_tasks.add(task)
+            task.add_done_callback(cls.notify_tasks.discard)
 
     @classmethod
-    async def on_change_config(cls, mood_cfg: MoodConfig):
-        scheduler = dp["scheduler"]
-        user_config = await dp["db"].get_user(mood_cfg.user_id)
-        job_id = f"mood_notify:{mood_cfg.user_id}"
-        date = datetime.datetime.now(user_config.tz).date()
-        if not mood_cfg.notify_current_day:
+    async def notify(cls, notification: DueNotification):
+        date = notification.due_time.date()
+        if not notification.mood_config.notify_current_day:
             date -= relativedelta(days=1)
 
-        with suppress(JobLookupError):
-            scheduler.remove_job(job_id)
-
-        if not mood_cfg.notify_state:
-            return
+        started = time.perf_counter()
+        try:
+            with bulk_sends():
+                outcome = await cls.notify_job_callback(
+                    notification.mood_config,
+                    notification.user_config,
+                    date,
+                    last_message=notification.last_message,
+                )
+        except Exception:
+            logger.exception(f"{notification.mood_config.user_id=}")
+            outcome = "error"
+        notify_send_latency.observe(time.perf_counter() - started)
+        notify_outcomes.inc(outcome=outcome)
 
-        scheduler.add_job(
-            notify_job_callback_proxy,
-            kwargs=NotifyJobData(
-                user_id=mood_cfg.user_id,
-                date=date,
-                is_current_day=mood_cfg.notify_current_day,
-            ),
-            id=job_id,
-            trigger="cron",
-            hour=mood_cfg.notify_time.hour,
-            minute=mood_cfg.notify_time.minute,
-            second=mood_cfg.notify_time.second,
-            timezone=user_config.tz,
-            misfire_grace_time=86400 * 7,
-        )
+        if outcome in ("sent", "sent_pm"):
+            due = notification.due_time.replace(tzinfo=notification.user_config.tz)
+            lag = datetime.datetime.now(datetime.UTC) - due
+            notify_lag.observe(max(lag.total_seconds(), 0.0))
 
     @classmethod
     def is_replied_to_notify_job_panel_filter(cls, m: Message):
@@ -981,81 +1259,49 @@ class MoodNotifyConfigurator(Handler[Message | CallbackQuery]):
             pass
 
     @classmethod
-    async def notify_job_panel(
-        cls, mood_cfg: MoodConfig, date: datetime.date, is_current_day: bool
+    def notify_panel_template(cls, locale: str) -> NotifyPanelTemplate:
+        if (template := cls.notify_panels.get(locale)) is None:
+            template = cls.notify_panels[locale] = NotifyPanelTemplate.build(locale)
+        return template
+
+    @classmethod
+    def notify_job_panel(
+        cls, mood_cfg: MoodConfig, user_config: UserConfig, date: datetime.date
     ) -> dict[str, Any]:
-        user_config = await dp["db"].get_user(mood_cfg.user_id)
-        i18n = cast(
-            I18nContext, dp["i18n_middleware"].new_context(user_config.lang_code, {})
-        )
-        user_name = user_config.text_url
-        user_name += f'<a href="tg://user?id={user_config.user_id}">\xad</a>'
+        template = cls.notify_panel_template(user_config.lang_code)
+        i18n = template.i18n
         text = i18n.mood_notify.notification(
             user_name=user_config.text_url,
             dmy=date.strftime(r"%d.%m.%Y"),
             weekday=i18n.get(f"weekday_{date.weekday() + 1}"),
             day="current" if mood_cfg.notify_current_day else "previos",
         )
-        kb = [
-            *utils.chunks(
-                (
-                    InlineKeyboardButton(
-                        text=f"{str(mood)} {i18n.get(f'mood-{mood.name.lower()}')}",
-                        callback_data=MarkMoodDay(
-                            user_id=user_config.user_id,
-                            value=int(mood),
-                            year=date.year,
-                            month=date.month,
-                            day=date.day,
-                            go_to="from_notify",
-                        ).pack(),
-                    )
-                    for mood in (*list(Mood)[1:],)
-                ),
-                2,
-            ),
-            [
-                InlineKeyboardButton(
-                    text=i18n.close(),
-                    callback_data=DeleteMessage(user_id=user_config.user_id).pack(),
-                )
-            ],
-        ]
-        return dict(text=text, reply_markup=InlineKeyboardMarkup(inline_keyboard=kb))
+        return dict(
+            text=text, reply_markup=template.keyboard(user_config.user_id, date)
+        )
 
     @classmethod
     async def notify_job_callback(
-        cls, user_id: int, date: datetime.date, is_current_day: bool
-    ):
+        cls,
+        mood_config: MoodConfig,
+        user_config: UserConfig,
+        date: datetime.date,
+        *,
+        last_message: UserLastMessage | None = None,
+    ) -> Literal["sent", "sent_pm", "disabled"]:
         bot = dp["main_bot"]
-        mood_config = await dp["db"].get_mood_config(user_id)
-        job_id = f"mood_notify:{mood_config.user_id}"
-
-        dp["scheduler"].modify_job(
-            job_id=job_id,
-            kwargs=NotifyJobData(
-                user_id=user_id,
-                date=date + relativedelta(days=1),
-                is_current_day=is_current_day,
-            ),
-        )
-
-        panel = await cls.notify_job_panel(mood_config, date, is_current_day)
+        user_id = mood_config.user_id
+        panel = cls.notify_job_panel(mood_config, user_config, date)
         request = SendMessage(
             chat_id=mood_config.notify_chat_id or user_id,
             message_thread_id=mood_config.notify_chat_topic_id,
             disable_notification=False,
             **panel,
         ).as_(bot)
-        if mood_config.notify_chat_id:
-            if last_message := await dp["db"].get_last_message(
-                mood_config.notify_chat_id,
-                topic_id=mood_config.notify_chat_topic_id,
-                user_id=user_id,
-            ):
-                request.reply_parameters = ReplyParameters(
-                    message_id=last_message.message.message_id
-                )
+        if mood_config.notify_chat_id and last_message:
+            request.reply_parameters = ReplyParameters(
+                message_id=last_message.message.message_id
+            )
 
         try:
             try:
@@ -1080,13 +1326,22 @@ class MoodNotifyConfigurator(Handler[Message | CallbackQuery]):
                     mood_config.notify_chat_id = None
                     mood_config.notify_chat_topic_id = None
                     await mood_config.merge()
+                    return "sent_pm"
         except TelegramAPIError:
             logger.exception(f"cant send message to {mood_config.user_id}")
             mood_config.notify_state = False
             await mood_config.merge()
+            return "disabled"
+        return "sent"
+
+
+metrics.Gauge(
+    "mood_notify_in_flight",
+    "Notifications waiting for or in delivery",
+    lambda: [((), len(MoodNotifyConfigurator.notify_tasks))],
+)
 
 
-async def notify_job_callback_proxy(**data: Unpack[NotifyJobData]):
+async def notify_tick_proxy(since: datetime.datetime):
     # apscheduler only support module-side funcs
-    data.setdefault("is_current_day", False)
-    return await MoodNotifyConfigurator.notify_job_callback(**data)
+    return await MoodNotifyConfigurator.notify_tick(since)
@@ -17,7 +17,7 @@ from app import utils
 from app.geo import Geolocator
 from app.main import commands_router
 from app.i18n import I18nContext
-from app.database import Database, UserConfig
+from app.database import UserConfig
 
 from app.handlers.common import Handler
 from app.handlers.middlewares import MiddlewareData
@@ -92,12 +92,9 @@ async def set_timezone(
     m: Message,
     command: CommandObject,
     geo: Geolocator,
-    db: Database,
     user_config: UserConfig,
     i18n: I18nContext,
 ):
-    from app.handlers.mood import MoodNotifyConfigurator
-
     answer = m.answer if m.chat.type == "private" else m.reply
     date_time_fmt = r"%H:%M, %d.%m.%y ({})"
 
@@ -133,9 +130,6 @@ async def set_timezone(
 
     user_config.timezone = timezone
     await user_config.merge()
-    await MoodNotifyConfigurator.on_change_config(
-        await db.get_mood_config(user_config.user_id)
-    )
 
     await loading.edit_text(
         text=i18n.tz_command.changed(
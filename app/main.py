@@ -3,16 +3,18 @@
 from __future__ import annotations
 
 import asyncio
+from contextvars import ContextVar
+from dataclasses import dataclass
 from pathlib import Path
 import logging
-from typing import TYPE_CHECKING, Any, Literal, overload
+from typing import TYPE_CHECKING, Any, Hashable, Literal, overload
 
 
 import aiogram
 from aiogram import Bot, Router
-from aiogram.fsm.storage.base import StorageKey
-from aiogram.fsm.storage.memory import SimpleEventIsolation
-from aiogram.types import BotCommandScopeDefault, BotCommand
+from aiogram.fsm.storage.base import BaseEventIsolation, DefaultKeyBuilder, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.types import BotCommandScopeDefault, BotCommand, Update
 from aiogram.methods import SetMyCommands
 from telethon import TelegramClient
 
@@ -29,6 +31,12 @@ APP_DIR = Path(__file__).parent.parent
 LOCALES_DIR = APP_DIR / "locales/"
 
 DEV_MODE: bool
+PRIMARY_PROCESS = True
+"""`False` in sharded workers but first, only primary process
+runs scheduler, telethon client and reads updates from telegram"""
+RESTARTED = False
+"""Worker restarted by supervisor, updates pending in telegram
+belong to running bot, so they are neither drained nor dropped"""
 
 # fmt: off
 if TYPE_CHECKING:
@@ -75,14 +83,70 @@ class ConcurrentEventError(Exception):
     pass
 
 
-class EventIsolation(SimpleEventIsolation):
+@dataclass(slots=True)
+class EventIsolationStats:
+    processed: int = 0
+    queued: int = 0
+    coalesced: int = 0
+    dropped: int = 0
+
+
+event_payload = ContextVar[Hashable | None]("event_payload", default=None)
+"""Identity of current update for coalescing, set by `isolate_events`"""
+
+
+class EventIsolation(BaseEventIsolation):
+    """
+    Events of one key run one at a time in arrival order, events of different
+    keys run in parallel; event is skipped with `ConcurrentEventError`
+    if `max_depth` events of key already wait or if it is the same
+    callback query as a pending one (e.g. double tap)
+
+    :param backend: Isolation shared with other processes, entered after
+        local queue, so each process holds at most one lock of key
+    """
+
+    def __init__(
+        self, max_depth: int = 5, backend: BaseEventIsolation | None = None
+    ) -> None:
+        self.max_depth = max_depth
+        self.backend = backend
+        self.stats = EventIsolationStats()
+        self._locks = utils.LockPool()
+        self._payloads: set[tuple[StorageKey, Hashable]] = set()
+
     @asynccontextmanager
     async def lock(self, key: StorageKey):
-        lock = self._locks[key]
-        if lock.locked():
+        payload = event_payload.get()
+        pending = (key, payload) if payload is not None else None
+        if pending in self._payloads:
+            self.stats.coalesced += 1
             raise ConcurrentEventError()
-        async with lock:
-            yield
+        if self._locks.depth(key) > self.max_depth:
+            self.stats.dropped += 1
+            raise ConcurrentEventError()
+        if self._locks.locked(key):
+            self.stats.queued += 1
+
+        if pending is not None:
+            self._payloads.add(pending)
+        try:
+            async with self._locks[key]:
+                if self.backend is None:
+                    self.stats.processed += 1
+                    yield
+                else:
+                    async with self.backend.lock(key):
+                        self.stats.processed += 1
+                        yield
+        finally:
+            if pending is not None:
+                self._payloads.discard(pending)
+
+    async def close(self) -> None:
+        self._payloads.clear()
+        if self.backend is not None:
+            await self.backend.close()
 
 
 dp = Dispatcher(events_isolation=EventIsolation())
@@ -93,6 +157,20 @@ admin_router = commands_router.include_router(Router())
 last_router = main_router.include_router(Router())
 
 
+def setup_storage(app_cfg: AppConfig):
+    """Keep FSM states and event locks in redis, shared between processes"""
+    if app_cfg.redis_url is None:
+        return
+    storage = RedisStorage.from_url(
+        app_cfg.redis_url.get_secret_value(),
+        key_builder=DefaultKeyBuilder(with_bot_id=True),
+        state_ttl=app_cfg.fsm_ttl,
+        data_ttl=app_cfg.fsm_ttl,
+    )
+    dp.fsm.storage = storage
+    dp.fsm.events_isolation.backend = storage.create_isolation()
+
+
 def setup_logging():
     logging.basicConfig(level=logging.INFO)
 
@@ -125,7 +203,7 @@ def get_my_commands() -> list[SetMyCommands]:
                         command=cmd,
                         description=core.get(f"bot_command-{cmd}", language_code),
                     )
-                    for cmd in ["start", "mood", "notify", "tz", "version"]
+                    for cmd in ["start", "mood", "stats", "notify", "tz", "version"]
                 ],
             )
         )
@@ -154,7 +232,7 @@ async def set_my_commands(bot: Bot):
 
 @dp.startup()
 async def create_telethon_client(dispatcher: Dispatcher, app_cfg: AppConfig):
-    if app_cfg.api_id is None or app_cfg.api_hash is None:
+    if app_cfg.api_id is None or app_cfg.api_hash is None or not PRIMARY_PROCESS:
         return
     client = TelegramClient(
         AsyncSQLiteSession(
@@ -177,12 +255,24 @@ async def create_telethon_client(dispatcher: Dispatcher, app_cfg: AppConfig):
         dispatcher["tl_bot"] = client
 
 
+def get_event_payload(update: Update) -> Hashable | None:
+    if (call := update.callback_query) is not None and call.data is not None:
+        message_id = call.message.message_id if call.message else call.inline_message_id
+        return (message_id, call.data)
+    return None
+
+
 @dp.update.outer_middleware
-async def suppress_concurrent_event_error(handler, event, data):
+async def isolate_events(handler, event: Update, data):
+    token = event_payload.set(get_event_payload(event))
     try:
         return await handler(event, data)
     except ConcurrentEventError:
-        pass
+        if event.callback_query is not None:
+            # stop button spinner of skipped tap
+            await utils.suppress_error(event.callback_query.answer())
+    finally:
+        event_payload.reset(token)
 
 
 dp.update.outer_middleware._middlewares.insert(
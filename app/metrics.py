@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import bisect
+import math
+from typing import Callable, Iterable
+
+from aiohttp import web
+
+from app import utils
+from app.main import dp
+
+
+__all__ = (
+    "Counter",
+    "Histogram",
+    "Gauge",
+    "CounterFunc",
+    "Registry",
+    "registry",
+    "MetricsServer",
+)
+
+
+logger = utils.get_logger()
+
+type Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], **extra: str) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    type: str
+
+    def __init__(self, name: str, help: str, labels: Labels = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        registry.register(self)
+
+    def _label_values(self, labels: dict[str, str]) -> Labels:
+        if labels.keys() != set(self.labels):
+            raise ValueError(
+                f"{self.name}: expected labels {self.labels}, got {labels}"
+            )
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join(
+            [
+                f"# HELP {self.name} {self.help}",
+                f"# TYPE {self.name} {self.type}",
+                *self.samples(),
+            ]
+        )
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Labels = ()) -> None:
+        super().__init__(name, help, labels)
+        self.values: dict[Labels, float] = {}
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        key = self._label_values(labels)
+        self.values[key] = self.values.get(key, 0) + value
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, help: str, buckets: Iterable[float], labels: Labels = ()
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = sorted(buckets)
+        self.values: dict[Labels, tuple[list[int], list[float]]] = {}
+        """`labels`: `(per bucket counts, [sum])`, last bucket is `+Inf`"""
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        if (item := self.values.get(key)) is None:
+            item = self.values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = item
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def samples(self) -> Iterable[str]:
+        for key, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip([*self.buckets, math.inf], counts):
+                cumulative += count
+                labels = _format_labels(self.labels, key, le=_format_value(bound))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum{labels} {_format_value(total[0])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge(Metric):
+    """Value read by `collect` on each scrape"""
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Iterable[tuple[Labels, float]]],
+        labels: Labels = (),
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        try:
+            values = list(self.collect())
+        except Exception:
+            logger.exception(f"{self.name}: collect failed")
+            return
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class CounterFunc(Gauge):
+    """Cumulative value read by `collect` on each scrape, never decreases"""
+
+    type = "counter"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        if metric.name in self.metrics:
+            raise ValueError(f"metric already registered: {metric.name}")
+        self.metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+registry = Registry()
+
+
+class MetricsServer:
+    """Serves `registry` at `GET /metrics`"""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.runner: web.AppRunner | None = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=registry.render(), content_type="text/plain", charset="utf-8"
+        )
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+def _cache_stats():
+    cache = dp["db"].cache
+    for name in ("users", "mood_months", "mood_years"):
+        stats = getattr(cache, name).stats
+        for field in ("hits", "misses", "evictions", "expirations"):
+            yield (name, field), getattr(stats, field)
+
+
+def _cache_sizes():
+    cache = dp["db"].cache
+    for name in ("users", "mood_months", "mood_years"):
+        yield (name,), len(getattr(cache, name))
+
+
+def _isolation_stats():
+    stats = dp.fsm.events_isolation.stats
+    for field in ("processed", "queued", "coalesced", "dropped"):
+        yield (field,), getattr(stats, field)
+
+
+def _writers():
+    return (
+        dp["db"].users_writer,
+        dp["db"].last_message_writer,
+        dp["scheduler"].jobstore.writer,
+    )
+
+
+def _writer_stats():
+    for writer in _writers():
+        for field in (
+            "queued",
+            "coalesced",
+            "flushed",
+            "flushes",
+            "errors",
+            "retried",
+            "dropped",
+            "overflowed",
+        ):
+            yield (writer.name, field), getattr(writer.stats, field)
+
+
+def _writer_depth():
+    for writer in _writers():
+        yield (writer.name,), writer.depth
+
+
+CounterFunc(
+    "cache_events_total",
+    "Cache lookups and drops",
+    _cache_stats,
+    labels=("cache", "event"),
+)
+Gauge("cache_size", "Entries in cache", _cache_sizes, labels=("cache",))
+CounterFunc(
+    "write_behind_events_total",
+    "Write-behind queue events",
+    _writer_stats,
+    labels=("queue", "event"),
+)
+Gauge(
+    "write_behind_depth",
+    "Pending writes in write-behind queue",
+    _writer_depth,
+    labels=("queue",),
+)
+CounterFunc(
+    "update_isolation_events_total",
+    "Updates processed, queued behind same user or skipped",
+    _isolation_stats,
+    labels=("event",),
+)
+Gauge(
+    "anti_flood_users",
+    "Users tracked by anti flood",
+    lambda: [((), len(dp["anti_flood_mw"].users))],
+)
+CounterFunc(
+    "anti_flood_skipped_total",
+    "Updates skipped by anti flood",
+    lambda: [((), dp["anti_flood_mw"].skipped)],
+)
@@ -1,8 +1,13 @@
+from __future__ import annotations
+
 import enum
 import datetime
-from typing import Any
+from typing import Any, Iterable, Iterator, Sequence, overload
 from dateutil.relativedelta import relativedelta
 
+from pydantic import GetCoreSchemaHandler, SerializationInfo
+from pydantic_core import core_schema
+
 
 class _MoodMonthMixin:
     @property
@@ -30,14 +35,129 @@ class Mood(enum.Enum):
         return self.emoji
 
     @classmethod
-    def convert(cls, value: str | int):
-        return [x for x in cls if value in {x.index, x.emoji}][0]
+    def convert(cls, value: str | int) -> Mood:
+        """Mood by index or emoji"""
+        try:
+            return _MOOD_LOOKUP[value]
+        except KeyError:
+            raise ValueError(f"unknown mood: {value!r}") from None
+
+    @classmethod
+    def from_index(cls, index: int) -> Mood:
+        return _MOODS[index]
+
+    @classmethod
+    def convert_many(cls, indexes: bytes | bytearray | Iterable[int]) -> list[Mood]:
+        """Bulk `from_index`, e.g. for whole month days"""
+        return list(map(_MOODS.__getitem__, indexes))
+
+
+_MOODS: tuple[Mood, ...] = tuple(Mood)
+"""`Mood.index`: `Mood`"""
+_MOOD_LOOKUP: dict[str | int, Mood] = {
+    **{mood.index: mood for mood in Mood},
+    **{mood.emoji: mood for mood in Mood},
+}
+
+
+class MoodDays(Sequence[Mood]):
+    """Moods of month days, stored as one byte per day (`Mood.index`)"""
+
+    __slots__ = ("_data",)
+
+    def __init__(
+        self, data: bytes | bytearray | memoryview | Iterable[int | Mood] = b""
+    ):
+        if isinstance(data, bytes | bytearray | memoryview):
+            self._data = bytearray(data)
+        else:
+            self._data = bytearray(map(int, data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @overload
+    def __getitem__(self, index: int) -> Mood: ...
+    @overload
+    def __getitem__(self, index: slice) -> list[Mood]: ...
+    def __getitem__(self, index: int | slice) -> Mood | list[Mood]:
+        if isinstance(index, slice):
+            return Mood.convert_many(self._data[index])
+        return _MOODS[self._data[index]]
+
+    def __setitem__(self, index: int, mood: Mood | int) -> None:
+        self._data[index] = int(mood)
+
+    def __iter__(self) -> Iterator[Mood]:
+        return map(_MOODS.__getitem__, self._data)
+
+    def __bytes__(self) -> bytes:
+        return bytes(self._data)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, MoodDays):
+            return self._data == other._data
+        if isinstance(other, list | tuple):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({bytes(self._data)!r})"
+
+    def __copy__(self):
+        return type(self)(self._data)
+
+    def __deepcopy__(self, memo: dict[int, Any]):
+        return type(self)(self._data)
+
+    def any(self) -> bool:
+        """Whether any day is marked"""
+        return any(self._data)
+
+    def counts(self) -> tuple[int, ...]:
+        """Days count per mood, indexed by `Mood.index`"""
+        return tuple(map(self._data.count, range(len(_MOODS))))
+
+    @classmethod
+    def _validate(cls, value: Any):
+        if isinstance(value, cls):
+            return value
+        if not isinstance(value, bytes | bytearray | memoryview | list | tuple):
+            raise ValueError(f"invalid days type: {type(value).__name__}")
+        try:
+            days = cls(value)
+        except TypeError:
+            # `None` or other non-index day in list
+            raise ValueError(f"invalid days: {value!r}") from None
+        if days._data and max(days._data) >= len(_MOODS):
+            raise ValueError(f"invalid mood index: {max(days._data)}")
+        return days
+
+    def _serialize(self, info: SerializationInfo):
+        return list(self._data) if info.mode == "json" else bytes(self._data)
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls._validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                cls._serialize, info_arg=True
+            ),
+        )
+
+
+def dominant_mood(counts: Sequence[int]) -> Mood:
+    """Most frequent marked mood of `MoodDays.counts`, `Mood.UNSET` if none"""
+    index = max(range(1, len(counts)), key=counts.__getitem__)
+    return _MOODS[index] if counts[index] else Mood.UNSET
 
 
-def create_days_list(year: int, month: int) -> list[Mood]:
+def create_days_list(year: int, month: int) -> MoodDays:
     month_date = datetime.date(year, month, 1)
     days = days_in_month(month_date)
-    return [Mood.UNSET] * days
+    return MoodDays(bytes(days))
 
 
 def create_days_notes_list(year: int, month: int) -> list[str | None]:
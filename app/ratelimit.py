@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import enum
+import heapq
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
+
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from app import utils
+from app.utils import LRUCache, LockPool
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.methods import Response
+
+    from app.config import AppConfig
+
+
+logger = utils.get_logger()
+
+
+class SendPriority(enum.IntEnum):
+    INTERACTIVE = 0
+    BULK = 1
+
+
+send_priority = ContextVar("send_priority", default=SendPriority.INTERACTIVE)
+
+
+@contextmanager
+def bulk_sends():
+    """Sends made within context yield to interactive replies"""
+    token = send_priority.set(SendPriority.BULK)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second up to `capacity`,
+    waiters are served by priority, then in arrival order
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or 1.0
+        self.tokens = self.capacity
+        self._updated = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._counter = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: int = SendPriority.INTERACTIVE) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self._grant()
+        await future
+
+    def pause(self, seconds: float) -> None:
+        """Grant nothing for `seconds`, e.g. on flood wait"""
+        self._refill(asyncio.get_running_loop().time())
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self._updated = now
+
+    def _grant(self) -> None:
+        now = asyncio.get_running_loop().time()
+        self._refill(now)
+        while self._waiters and self.tokens >= 1:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():  # cancelled
+                continue
+            self.tokens -= 1
+            future.set_result(None)
+
+        if self._waiters and self._timer is None:
+            delay = (1 - self.tokens) / self.rate
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._grant()
+
+
+class SendRateLimiter(BaseRequestMiddleware):
+    """
+    Bot session middleware which spaces outgoing messages
+    by global and per-chat limits and retries flood waits
+
+    :param global_rate: Messages per second over all chats
+    :param chat_interval: Seconds between new messages to private chat
+    :param group_interval: Seconds between new messages to group chat
+    :param retry_attempts: Retries of request failed with flood wait
+    """
+
+    methods_prefixes = ("send", "copy", "forward", "edit")
+    spaced_prefixes = ("send", "copy", "forward")
+    """Methods creating new message, chat interval is kept only between them"""
+    unspaced_methods = frozenset({"sendChatAction"})
+
+    def __init__(
+        self,
+        *,
+        global_rate: float = 30,
+        chat_interval: float = 1.0,
+        group_interval: float = 3.0,
+        retry_attempts: int = 3,
+    ) -> None:
+        self.bucket = TokenBucket(global_rate)
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.retry_attempts = retry_attempts
+        self.chats: LRUCache[int | str, float] = LRUCache(100_000)
+        """`chat_id`: loop time of next allowed message"""
+        self.chat_locks = LockPool()
+
+    @classmethod
+    def from_config(
+        cls, app_cfg: AppConfig, *, workers: int = 1, worker_index: int = 0
+    ) -> SendRateLimiter:
+        """
+        Telegram limit is per bot, so with several workers it is split:
+        primary worker, which also sends bulk notifications, gets
+        `send_primary_share` of it, others share the rest equally
+        """
+        global_rate = app_cfg.send_global_rate
+        if workers > 1:
+            primary_rate = global_rate * app_cfg.send_primary_share
+            if worker_index == 0:
+                global_rate = primary_rate
+            else:
+                global_rate = (global_rate - primary_rate) / (workers - 1)
+        return cls(
+            global_rate=global_rate,
+            chat_interval=app_cfg.send_chat_interval,
+            group_interval=app_cfg.send_group_interval,
+            retry_attempts=app_cfg.send_retry_attempts,
+        )
+
+    def is_limited(self, method: TelegramMethod) -> bool:
+        return method.__api_method__.startswith(self.methods_prefixes) and bool(
+            getattr(method, "chat_id", None)
+        )
+
+    def is_spaced(self, method: TelegramMethod) -> bool:
+        return (
+            method.__api_method__.startswith(self.spaced_prefixes)
+            and method.__api_method__ not in self.unspaced_methods
+        )
+
+    def interval(self, chat_id: int | str) -> float:
+        if isinstance(chat_id, int) and chat_id > 0:
+            return self.chat_interval
+        return self.group_interval
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if not self.is_limited(method):
+            return await make_request(bot, method)
+
+        chat_id = method.chat_id  # type: ignore
+        if not self.is_spaced(method):
+            # edits and chat actions only share global rate,
+            # so button presses in busy chat don't queue behind each other
+            return await self._request(make_request, bot, method, chat_id, 0.0)
+
+        # one request per chat at a time, so chat interval is kept between sends
+        async with self.chat_locks[chat_id]:
+            return await self._request(
+                make_request, bot, method, chat_id, self.interval(chat_id)
+            )
+
+    async def _request(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        chat_id: int | str,
+        interval: float,
+    ) -> Response[TelegramType]:
+        priority = send_priority.get()
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            resume_at = self.chats.get(chat_id) or 0.0
+            if (delay := resume_at - loop.time()) > 0:
+                await asyncio.sleep(delay)
+            await self.bucket.acquire(priority)
+
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                if attempt > self.retry_attempts:
+                    raise
+                logger.warning(
+                    f"Flood wait {e.retry_after}s on {method.__api_method__} "
+                    f"in chat {chat_id}, attempt {attempt}"
+                )
+                self.chats[chat_id] = loop.time() + e.retry_after
+                # limits are exceeded, telegram rejects other chats too
+                self.bucket.pause(e.retry_after)
+            finally:
+                if interval:
+                    self.chats[chat_id] = max(
+                        self.chats.get(chat_id) or 0.0, loop.time() + interval
+                    )
@@ -1,29 +1,160 @@
 from __future__ import annotations
 
+import pickle
 from datetime import UTC
-from types import CoroutineType
-from typing import Callable
+from typing import Any
 
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
+
+from apscheduler.job import Job
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.util import datetime_to_utc_timestamp
 
+from app import main
 from app.utils import Singleton
 from app.main import dp
+from app._database.writer import WriteBehindQueue
+
+
+type JobChange = tuple[str, dict[str, Any] | None]
+"""`(job id, row)`, row is `None` for removed job"""
+
+
+class AsyncJobStore(MemoryJobStore):
+    """
+    Job store of `SQLAlchemyJobStore` table, served from memory and
+    persisted in background through async engine, so scheduler calls
+    never wait for database
+
+    Jobs must be loaded with `load` before scheduler start
+    """
+
+    metadata = sa.MetaData()
+    jobs_t = sa.Table(
+        "apscheduler_jobs",
+        metadata,
+        sa.Column("id", sa.Unicode(191), primary_key=True),
+        sa.Column("next_run_time", sa.Float(25), index=True),
+        sa.Column("job_state", sa.LargeBinary, nullable=False),
+    )
+
+    def __init__(
+        self, *, max_size: int = 500, interval: float = 1.0, pickle_protocol=None
+    ):
+        super().__init__()
+        self.pickle_protocol = pickle_protocol or pickle.HIGHEST_PROTOCOL
+        self.writer = WriteBehindQueue[str, JobChange](
+            "apscheduler_jobs", self.save_changes, max_size=max_size, interval=interval
+        )
+        self._states: list[tuple[str, bytes]] = []
+
+    async def load(self):
+        """Read jobs table, jobs are restored on `start`"""
+        async with dp["db"].engine.begin() as conn:
+            await conn.run_sync(self.metadata.create_all)
+            result = await conn.execute(
+                sa.select(self.jobs_t.c.id, self.jobs_t.c.job_state)
+            )
+            self._states = [(row.id, row.job_state) for row in result]
+        await self.writer.start()
 
+    def start(self, scheduler, alias):
+        super().start(scheduler, alias)
+        for job_id, job_state in self._states:
+            try:
+                job = self._reconstitute_job(job_state)
+            except BaseException:
+                self._logger.exception(
+                    f'Unable to restore job "{job_id}" -- removing it'
+                )
+                self.writer.put(job_id, (job_id, None))
+                continue
+            super().add_job(job)
+        self._states = []
 
-def wrap[T](fn: Callable[..., T]) -> Callable[..., CoroutineType[None, None, T]]:
-    # apscheduler calling asyncio.get_running_loop()
-    async def wrapped():
-        return fn()
+    async def close(self):
+        await self.writer.stop()
 
-    return wrapped
+    def add_job(self, job: Job):
+        super().add_job(job)
+        self.writer.put(job.id, (job.id, self._dump_job(job)))
+
+    def update_job(self, job: Job):
+        super().update_job(job)
+        self.writer.put(job.id, (job.id, self._dump_job(job)))
+
+    def remove_job(self, job_id: str):
+        super().remove_job(job_id)
+        self.writer.put(job_id, (job_id, None))
+
+    def remove_all_jobs(self):
+        for job in self.get_all_jobs():
+            self.writer.put(job.id, (job.id, None))
+        super().remove_all_jobs()
+
+    def shutdown(self):
+        # jobs stay in table, pending writes are flushed by `close`
+        pass
+
+    def _dump_job(self, job: Job) -> dict[str, Any]:
+        return dict(
+            id=job.id,
+            next_run_time=datetime_to_utc_timestamp(job.next_run_time),
+            job_state=pickle.dumps(job.__getstate__(), self.pickle_protocol),
+        )
+
+    def _reconstitute_job(self, job_state: bytes) -> Job:
+        state = pickle.loads(job_state)
+        state["jobstore"] = self
+        job = Job.__new__(Job)
+        job.__setstate__(state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    async def save_changes(self, changes: list[JobChange]):
+        removed = [job_id for job_id, row in changes if row is None]
+        rows = [row for _, row in changes if row is not None]
+        async with dp["db"].begin() as session:
+            if removed:
+                await session.execute(
+                    self.jobs_t.delete().where(self.jobs_t.c.id.in_(removed))
+                )
+            if rows:
+                stmt = insert(self.jobs_t).values(rows)
+                await session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=[self.jobs_t.c.id],
+                        set_=dict(
+                            next_run_time=stmt.excluded.next_run_time,
+                            job_state=stmt.excluded.job_state,
+                        ),
+                    )
+                )
 
 
 class Scheduler(AsyncIOScheduler, metaclass=Singleton):
     def __init__(self):
         super().__init__(timezone=UTC)
 
-        self.jobstore = SQLAlchemyJobStore(dp["app_cfg"].get_db_uri(mode="sync"))
+        app_cfg = dp["app_cfg"]
+        self.jobstore = AsyncJobStore(
+            max_size=app_cfg.write_behind_max_size,
+            interval=app_cfg.write_behind_interval,
+        )
         self.add_jobstore(self.jobstore)
-        dp.startup.register(wrap(self.start))
-        dp.shutdown.register(wrap(self.shutdown))
+        dp.startup.register(self.startup)
+        dp.shutdown.register(self.on_shutdown)
+
+    async def startup(self):
+        if not main.PRIMARY_PROCESS:
+            return
+        await self.jobstore.load()
+        self.start()
+
+    async def on_shutdown(self):
+        if self.running:
+            self.shutdown()
+        await self.jobstore.close()
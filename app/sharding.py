@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing
+import os
+import secrets
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from multiprocessing.process import BaseProcess
+from typing import TYPE_CHECKING, Any, Callable
+
+import uvloop
+from aiohttp import ClientError, ClientSession, UnixConnector, web
+
+from app import utils
+
+if TYPE_CHECKING:
+    from app.config import AppConfig
+
+
+logger = utils.get_logger()
+
+
+type WorkerTarget = Callable[[int, str, bool], object]
+"""Runs worker of index, serving updates posted to unix socket path,
+last argument is whether worker was restarted"""
+
+
+def get_route_key(update: dict[str, Any]) -> int:
+    """User of update, chat or update id if there is no user"""
+    for name, event in update.items():
+        if name == "update_id" or not isinstance(event, dict):
+            continue
+        for field in ("from", "user"):
+            if isinstance(user := event.get(field), dict) and "id" in user:
+                return user["id"]
+        if isinstance(chat := event.get("chat"), dict) and "id" in chat:
+            return chat["id"]
+    return update.get("update_id", 0)
+
+
+def _run_worker(target: WorkerTarget, index: int, socket: str, restarted: bool):
+    # own process group: terminal interrupt reaches supervisor only,
+    # which stops workers itself
+    os.setpgrp()
+    target(index, socket, restarted)
+
+
+@dataclass(slots=True)
+class Worker:
+    index: int
+    socket: str
+    process: BaseProcess | None = None
+    session: ClientSession | None = None
+    routed: int = 0
+    failed: int = 0
+    reported: int = 0
+    """`routed` at last report"""
+
+
+class Supervisor:
+    """
+    Receives telegram webhook updates and forwards each to worker process
+    chosen by user id, so state of user (caches, anti flood, FSM) lives
+    in one process; dead workers are restarted
+
+    :param target: Worker entry point, `0` is primary worker
+    :param report_interval: Seconds between per-worker throughput logs
+    """
+
+    def __init__(
+        self,
+        app_cfg: AppConfig,
+        workers: int,
+        target: WorkerTarget,
+        *,
+        report_interval: float = 60,
+    ) -> None:
+        self.app_cfg = app_cfg
+        self.target = target
+        self.report_interval = report_interval
+        self.socket_dir = tempfile.mkdtemp(prefix="ztx-bot-")
+        self.workers = [
+            Worker(index, os.path.join(self.socket_dir, f"worker-{index}.sock"))
+            for index in range(workers)
+        ]
+        self.context = multiprocessing.get_context("spawn")
+        self._monitor: asyncio.Task | None = None
+        self._stopping = False
+
+    def get_worker(self, update: dict[str, Any]) -> Worker:
+        return self.workers[get_route_key(update) % len(self.workers)]
+
+    def start_worker(self, worker: Worker, *, restarted: bool = False):
+        worker.process = self.context.Process(
+            target=_run_worker,
+            args=(self.target, worker.index, worker.socket, restarted),
+            name=f"worker-{worker.index}",
+        )
+        worker.process.start()
+        logger.info(f"Started worker {worker.index}, pid {worker.process.pid}")
+
+    async def handle(self, request: web.Request) -> web.Response:
+        secret = self.app_cfg.webhook_secret
+        if secret is not None and not secrets.compare_digest(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""),
+            secret.get_secret_value(),
+        ):
+            return web.Response(body="Unauthorized", status=401)
+
+        body = await request.read()
+        try:
+            worker = self.get_worker(json.loads(body))
+        except ValueError, TypeError:
+            return web.Response(body="Bad Request", status=400)
+
+        assert worker.session is not None
+        try:
+            async with worker.session.post(
+                f"http://worker{self.app_cfg.webhook_path}",
+                data=body,
+                headers={"Content-Type": "application/json"},
+            ) as response:
+                await response.read()
+                status = response.status
+        except ClientError:
+            status = None
+        if status != 200:
+            # telegram retries update until worker is back
+            worker.failed += 1
+            logger.warning(f"Worker {worker.index} did not accept update: {status}")
+            return web.Response(body="Service Unavailable", status=503)
+
+        worker.routed += 1
+        return web.json_response({})
+
+    async def monitor(self):
+        last_report = time.monotonic()
+        while True:
+            await asyncio.sleep(1)
+            for worker in self.workers:
+                assert worker.process is not None
+                if not worker.process.is_alive() and not self._stopping:
+                    logger.error(
+                        f"Worker {worker.index} exited "
+                        f"with code {worker.process.exitcode}, restarting"
+                    )
+                    self.start_worker(worker, restarted=True)
+
+            now = time.monotonic()
+            if now - last_report >= self.report_interval:
+                self.report(now - last_report)
+                last_report = now
+
+    def report(self, elapsed: float):
+        for worker in self.workers:
+            routed = worker.routed - worker.reported
+            worker.reported = worker.routed
+            logger.info(
+                f"Worker {worker.index}: {routed} updates, "
+                f"{routed / elapsed:.1f}/s, {worker.failed} failed total"
+            )
+
+    async def on_startup(self, app: web.Application):
+        for worker in self.workers:
+            self.start_worker(worker)
+            worker.session = ClientSession(connector=UnixConnector(path=worker.socket))
+        self._monitor = asyncio.create_task(self.monitor())
+
+    async def on_cleanup(self, app: web.Application):
+        self._stopping = True
+        if self._monitor is not None:
+            self._monitor.cancel()
+        for worker in self.workers:
+            if worker.session is not None:
+                await worker.session.close()
+            if worker.process is not None and worker.process.is_alive():
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker.process is not None:
+                await asyncio.to_thread(worker.process.join, 30)
+                if worker.process.is_alive():
+                    logger.error(f"Worker {worker.index} did not stop, killing")
+                    worker.process.kill()
+        shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+    def run(self) -> None:
+        """Serve webhook on `webhook_host:webhook_port` until interrupted"""
+        app = web.Application()
+        app.router.add_post(self.app_cfg.webhook_path, self.handle)
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        web.run_app(
+            app,
+            host=self.app_cfg.webhook_host,
+            port=self.app_cfg.webhook_port,
+            print=logger.info,
+            loop=uvloop.new_event_loop(),
+        )
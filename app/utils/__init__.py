@@ -12,6 +12,7 @@ from .utils import (
     get_topic_id,
 )
 from .regexp import Regexp
+from .cache import CacheStats, LRUCache, LockPool
 
 
 __all__ = (
@@ -27,4 +28,7 @@ __all__ = (
     "time_emoji",
     "get_topic_id",
     "Regexp",
+    "CacheStats",
+    "LRUCache",
+    "LockPool",
 )
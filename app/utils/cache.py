@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, Iterator
+
+
+__all__ = (
+    "CacheStats",
+    "LRUCache",
+    "LockPool",
+)
+
+
+_MISSING = object()
+
+
+@dataclass(slots=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LRUCache[K: Hashable, V]:
+    """
+    Size-bounded mapping with LRU eviction and optional per-entry TTL
+
+    :param maxsize: Max entries, `None` for unbounded
+    :param ttl: Seconds since last write before entry expires, `None` to disable
+    :param on_evict: Called with `(key, value)` for evicted and expired entries
+    """
+
+    def __init__(
+        self,
+        maxsize: int | None = None,
+        *,
+        ttl: float | None = None,
+        on_evict: Callable[[K, V], object] | None = None,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if maxsize is not None and maxsize <= 0:
+            raise ValueError(f"invalid maxsize: {maxsize}")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.timer = timer
+        self.stats = CacheStats()
+        self._data: OrderedDict[K, tuple[V, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(list(self._data))
+
+    def __contains__(self, key: object) -> bool:
+        item = self._data.get(key)  # type: ignore
+        return item is not None and not self._is_expired(item)
+
+    def __getitem__(self, key: K) -> V:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value  # type: ignore
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self.set(key, value)
+
+    def __delitem__(self, key: K) -> None:
+        del self._data[key]
+
+    def _is_expired(self, item: tuple[V, float]) -> bool:
+        return self.ttl is not None and self.timer() - item[1] >= self.ttl
+
+    def _evict(self, key: K, value: V) -> None:
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def get[D](self, key: K, default: D = None) -> V | D:
+        item = self._data.get(key)
+        if item is None:
+            self.stats.misses += 1
+            return default
+        if self._is_expired(item):
+            del self._data[key]
+            self.stats.misses += 1
+            self.stats.expirations += 1
+            self._evict(key, item[0])
+            return default
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return item[0]
+
+    def set(self, key: K, value: V) -> None:
+        self._data[key] = (value, self.timer())
+        self._data.move_to_end(key)
+        if self.maxsize is None:
+            return
+        while len(self._data) > self.maxsize:
+            old_key, (old_value, _) = self._data.popitem(last=False)
+            self.stats.evictions += 1
+            self._evict(old_key, old_value)
+
+    def pop[D](self, key: K, default: D = None) -> V | D:
+        item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def expire(self) -> int:
+        """Drop expired entries, returns count of dropped entries"""
+        if self.ttl is None:
+            return 0
+        expired = [key for key, item in self._data.items() if self._is_expired(item)]
+        for key in expired:
+            value, _ = self._data.pop(key)
+            self.stats.expirations += 1
+            self._evict(key, value)
+        return len(expired)
+
+
+class _PooledLock:
+    __slots__ = ("pool", "key", "lock")
+
+    def __init__(self, pool: LockPool, key: Hashable) -> None:
+        self.pool = pool
+        self.key = key
+        self.lock: asyncio.Lock | None = None
+
+    async def __aenter__(self) -> None:
+        self.lock = self.pool._acquire_ref(self.key)
+        try:
+            await self.lock.acquire()
+        except BaseException:
+            self.pool._release_ref(self.key)
+            raise
+
+    async def __aexit__(self, *exc_info) -> None:
+        assert self.lock is not None
+        self.lock.release()
+        self.pool._release_ref(self.key)
+
+    def locked(self) -> bool:
+        return self.pool.locked(self.key)
+
+
+class LockPool:
+    """
+    Keyed `asyncio.Lock` registry, lock is dropped once no one holds or waits it
+
+    Usage: `async with pool[key]: ...`
+    """
+
+    def __init__(self) -> None:
+        self._locks: dict[Hashable, tuple[asyncio.Lock, int]] = {}
+
+    def __getitem__(self, key: Hashable) -> _PooledLock:
+        return _PooledLock(self, key)
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._locks
+
+    def locked(self, key: Hashable) -> bool:
+        item = self._locks.get(key)
+        return item is not None and item[0].locked()
+
+    def depth(self, key: Hashable) -> int:
+        """Tasks holding or waiting lock of key"""
+        item = self._locks.get(key)
+        return item[1] if item is not None else 0
+
+    def _acquire_ref(self, key: Hashable) -> asyncio.Lock:
+        lock, refs = self._locks.get(key) or (asyncio.Lock(), 0)
+        self._locks[key] = (lock, refs + 1)
+        return lock
+
+    def _release_ref(self, key: Hashable) -> None:
+        lock, refs = self._locks[key]
+        if refs <= 1:
+            del self._locks[key]
+        else:
+            self._locks[key] = (lock, refs - 1)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Any
+
+import uvloop
+from aiohttp import web
+from aiogram import Bot
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from app import main, utils
+from app.main import dp
+
+if TYPE_CHECKING:
+    from aiogram import Dispatcher
+
+    from app.config import AppConfig
+
+
+logger = utils.get_logger()
+
+
+class WebhookRequestHandler(SimpleRequestHandler):
+    """
+    Answers telegram immediately and handles update in background,
+    at most `concurrency` updates at once
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        *,
+        concurrency: int,
+        secret_token: str | None = None,
+        **data: Any,
+    ) -> None:
+        super().__init__(
+            dispatcher,
+            bot,
+            handle_in_background=True,
+            secret_token=secret_token,
+            **data,
+        )
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def _background_feed_update(self, bot: Bot, update: dict[str, Any]) -> None:
+        async with self.semaphore:
+            await super()._background_feed_update(bot, update)
+
+    async def close(self) -> None:
+        # let accepted updates finish before bot session is closed
+        await asyncio.gather(
+            *self._background_feed_update_tasks, return_exceptions=True
+        )
+        await super().close()
+
+
+def get_webhook_url(app_cfg: AppConfig) -> str | None:
+    if app_cfg.webhook_url is None:
+        return None
+    return app_cfg.webhook_url.rstrip("/") + app_cfg.webhook_path
+
+
+def get_webhook_secret(app_cfg: AppConfig) -> str | None:
+    if app_cfg.webhook_secret is None:
+        return None
+    return app_cfg.webhook_secret.get_secret_value()
+
+
+async def set_webhook(bot: Bot, app_cfg: AppConfig):
+    # registered after offline updates handler, which drains pending updates;
+    # restarted worker keeps updates telegram retries meanwhile
+    url = get_webhook_url(app_cfg)
+    if url is None:
+        logger.warning("`webhook_url` is not set, webhook is not registered")
+        return
+    await bot.set_webhook(
+        url,
+        secret_token=get_webhook_secret(app_cfg),
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=not main.RESTARTED,
+    )
+    logger.info(f"Webhook is set to {url}")
+
+
+def run_webhook(
+    bot: Bot, app_cfg: AppConfig, *, unix_socket: str | None = None
+) -> None:
+    """
+    Serve updates posted by telegram to `webhook_path` until interrupted
+
+    :param unix_socket: Serve updates routed by supervisor on socket instead,
+        secret is checked by supervisor
+    """
+    app = web.Application()
+    WebhookRequestHandler(
+        dp,
+        bot,
+        concurrency=app_cfg.webhook_concurrency,
+        secret_token=None if unix_socket else get_webhook_secret(app_cfg),
+    ).register(app, path=app_cfg.webhook_path)
+    if main.PRIMARY_PROCESS:
+        dp.startup.register(set_webhook)
+    setup_application(app, dp, bot=bot, bots=[bot])
+
+    address = (
+        dict(path=unix_socket)
+        if unix_socket
+        else dict(host=app_cfg.webhook_host, port=app_cfg.webhook_port)
+    )
+    web.run_app(app, **address, print=logger.info, loop=uvloop.new_event_loop())
@@ -0,0 +1,93 @@
+"""
+Mood analytics over 100k users and 3 years of synthetic marks,
+matrix is filled by partitions of rows as `load_mood_matrix` does
+
+    uv run -m benchmarks.analytics [users]
+"""
+
+import datetime
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from app import analytics
+from app.analytics import MoodMatrix
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+START, END = datetime.date(2023, 1, 1), datetime.date(2025, 12, 31)
+BATCH_SIZE = 10_000
+"""Rows per partition, default of `load_mood_matrix`"""
+
+
+def months() -> list[tuple[int, int, int]]:
+    """`(year, month, days count)` of benchmark period"""
+    result = []
+    date = START
+    while date <= END:
+        next_month = (date + datetime.timedelta(days=32)).replace(day=1)
+        result.append((date.year, date.month, (next_month - date).days))
+        date = next_month
+    return result
+
+
+def partitions(rng: np.random.Generator):
+    """Rows of `mood` table, 70% of days marked"""
+    batch = []
+    users_per_batch = max(1, BATCH_SIZE // len(months()))
+    for offset in range(0, USERS, users_per_batch):
+        user_ids = range(offset, min(offset + users_per_batch, USERS))
+        for year, month, count in months():
+            days = rng.integers(1, 7, (len(user_ids), count), dtype=np.uint8)
+            days[rng.random(days.shape) > 0.7] = 0
+            batch += [
+                (user_id, year, month, data.tobytes())
+                for user_id, data in zip(user_ids, days)
+            ]
+        yield batch
+        batch = []
+
+
+def measure(name: str, function, *args):
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    print(f"{name:<22} {elapsed:7.2f} s  peak {peak:7.1f} MiB above matrix")
+    return result
+
+
+def fill(matrix: MoodMatrix, rng: np.random.Generator) -> float:
+    """Seconds spent in `fill`, without generating rows"""
+    elapsed = 0.0
+    for rows in partitions(rng):
+        start = time.perf_counter()
+        matrix.fill(rows)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def main():
+    rng = np.random.default_rng(0)
+    matrix = MoodMatrix.empty(range(USERS), START, END)
+    print(
+        f"{USERS} users x {matrix.days.shape[1]} days, "
+        f"matrix {matrix.days.nbytes / 2**20:.1f} MiB"
+    )
+    print(f"{'fill':<22} {fill(matrix, rng):7.2f} s")
+
+    # started after fill, tracing slows down python code of rows a lot
+    tracemalloc.start()
+
+    measure("weekday_counts", analytics.weekday_counts, matrix)
+    measure("weekday_correlation", analytics.weekday_correlation, matrix)
+    measure("monthly_distribution", analytics.monthly_distribution, matrix)
+    means = measure("monthly_mean", analytics.monthly_mean, matrix)
+    measure("streaks", analytics.streaks, matrix)
+    measure("percentile_bands", analytics.percentile_bands, means)
+
+
+if __name__ == "__main__":
+    main()
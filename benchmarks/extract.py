@@ -0,0 +1,70 @@
+"""
+Users extraction from recorded updates by plan of `extract_users`
+and by `model_dump` walk, as before the plan
+
+    uv run -m benchmarks.extract
+"""
+
+import json
+import statistics
+import time
+from pathlib import Path
+
+from aiogram.types import Update, User
+from pydantic import BaseModel
+
+from app._database.extract import extract_users
+
+RUNS = 7
+ROUNDS = 200
+UPDATES = Path(__file__).parents[1] / "tests" / "data" / "updates.json"
+
+
+def model_dump_users(event: BaseModel) -> list[User]:
+    """`Database.extract_users` before extraction plan"""
+    users: list[User] = []
+    fields = list(event.model_dump())
+
+    for value in map(lambda x: getattr(event, x), fields):
+        if isinstance(value, User):
+            users += [value]
+        elif isinstance(value, BaseModel):
+            users += model_dump_users(value)
+
+    return users
+
+
+def measure(function, updates: list[Update]) -> float:
+    """Median microseconds per update"""
+    results = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            for update in updates:
+                function(update)
+        results.append((time.perf_counter() - start) / ROUNDS / len(updates) * 1e6)
+    return statistics.median(results)
+
+
+def main():
+    updates = [Update.model_validate(x) for x in json.loads(UPDATES.read_text())]
+    extract_users(updates[0])  # plans are built once per type
+
+    for update in updates:
+        old, new = model_dump_users(update), extract_users(update)
+        if [user.id for user in old] != [user.id for user in new]:
+            print(
+                f"update {update.update_id}: model_dump {len(old)} users, "
+                f"plan {len(new)} users"
+            )
+
+    model_dump = measure(model_dump_users, updates)
+    plan = measure(extract_users, updates)
+    print(
+        f"{len(updates)} updates: model_dump {model_dump:.1f} us, "
+        f"plan {plan:.1f} us per update ({model_dump / plan:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
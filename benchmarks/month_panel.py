@@ -0,0 +1,76 @@
+"""
+Month panel rendering with callback data packed by `CallbackCodec`
+and by pydantic, as before the codec
+
+    uv run -m benchmarks.month_panel
+"""
+
+import asyncio
+import datetime
+import statistics
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from app.database import MoodMonth
+from app.handlers.callback_data import CallbackCodec, MoodMonthCallback
+from app.handlers.mood import MoodMonthHandler
+from app.mood import Mood
+
+RUNS = 7
+PANELS = 500
+
+
+class FakeDatabase:
+    def __init__(self) -> None:
+        self.month = MoodMonth(user_id=1, year=2025, month=3)
+        for day in range(1, 32, 2):
+            self.month.save_mood(day, Mood.from_index(day % 6 + 1))
+
+    async def get_mood_month(self, user_id: int, *, year: int, month: int):
+        return self.month
+
+
+def data(marker: int):
+    return {
+        "callback_data": MoodMonthCallback(
+            user_id=123456789, year=2025, month=3, marker=marker
+        ),
+        "db": FakeDatabase(),
+        "i18n": SimpleNamespace(
+            mood_month=lambda **kwargs: "panel",
+            get=str,
+            mood_year=SimpleNamespace(open_button=lambda **kwargs: "year"),
+        ),
+        "user_config": SimpleNamespace(current_time=datetime.datetime(2025, 3, 15)),
+    }
+
+
+async def measure(marker: int) -> float:
+    """Median microseconds per panel"""
+    panel_data = data(marker)
+    results = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        for _ in range(PANELS):
+            await MoodMonthHandler.panel(panel_data)  # type: ignore
+        results.append((time.perf_counter() - start) / PANELS * 1e6)
+    return statistics.median(results)
+
+
+async def main():
+    for marker in (-1, 3):
+        with (
+            mock.patch.object(CallbackCodec, "pack", lambda *args: None),
+            mock.patch.object(CallbackCodec, "pack_merge", lambda *args: None),
+        ):
+            pydantic = await measure(marker)
+        codec = await measure(marker)
+        print(
+            f"marker {marker:>2}: pydantic {pydantic:.0f} us, codec {codec:.0f} us "
+            f"per panel ({pydantic / codec:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""
+Mood conversion and month validation, with `MoodDays` bytes
+and with `list[Mood]` days validated as before it
+
+    uv run -m benchmarks.mood_days
+"""
+
+import statistics
+import time
+
+from pydantic import (
+    BaseModel,
+    Field,
+    ValidationInfo,
+    field_serializer,
+    field_validator,
+)
+
+from app.database import MoodMonth
+from app.mood import Mood, MoodDays, create_days_notes_list
+
+RUNS = 7
+NUMBER = 5_000
+
+
+def old_convert(value: str | int) -> Mood:
+    """`Mood.convert` before lookup table"""
+    return [x for x in Mood if value in {x.index, x.emoji}][0]
+
+
+class OldMoodMonth(BaseModel):
+    """Validation of `MoodMonth` days before `MoodDays`"""
+
+    user_id: int
+    year: int
+    month: int
+    days: list[Mood]
+    days_notes: list[str | None] = Field(
+        default_factory=lambda data: create_days_notes_list(data["year"], data["month"])
+    )
+
+    @field_validator("days_notes", mode="before")
+    @classmethod
+    def _validate_days_notes(cls, notes: list[str | None] | None, info: ValidationInfo):
+        if notes is None:
+            notes = create_days_notes_list(info.data["year"], info.data["month"])
+        return notes
+
+    @field_validator("days", mode="before")
+    @classmethod
+    def _validate_days(cls, days: list[int | Mood]):
+        for i, mood in enumerate(days):
+            if isinstance(mood, int):
+                days[i] = list(Mood)[mood]
+
+        return days
+
+    @field_serializer("days")
+    def _serialize_days(self, days: list[Mood]):
+        return list(map(int, days))
+
+
+def measure(function, *args) -> float:
+    """Median microseconds per call"""
+    results = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        for _ in range(NUMBER):
+            function(*args)
+        results.append((time.perf_counter() - start) / NUMBER * 1e6)
+    return statistics.median(results)
+
+
+def compare(name: str, before: float, after: float):
+    print(
+        f"{name:<24} before {before:7.2f} us, after {after:7.2f} us "
+        f"({before / after:.1f}x)"
+    )
+
+
+def main():
+    indexes = [day % 7 for day in range(31)]
+    row = {"user_id": 1, "year": 2025, "month": 1, "days_notes": None}
+
+    compare(
+        "Mood.convert",
+        measure(lambda: [old_convert(x) for x in (3, "💀")]) / 2,
+        measure(lambda: [Mood.convert(x) for x in (3, "💀")]) / 2,
+    )
+    compare(
+        "convert 31 days",
+        measure(lambda: [old_convert(x) for x in indexes]),
+        measure(Mood.convert_many, bytes(indexes)),
+    )
+    compare(
+        "MoodDays._validate",
+        measure(lambda: OldMoodMonth._validate_days(list(indexes))),
+        measure(MoodDays._validate, bytes(indexes)),
+    )
+    compare(
+        "MoodMonth validation",
+        # list is copied, old validator changes it in place
+        measure(lambda: OldMoodMonth.model_validate({**row, "days": list(indexes)})),
+        measure(MoodMonth.model_validate, {**row, "days": bytes(indexes)}),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 bot_command-mood = Календарь настроения
+bot_command-stats = Статистика настроения
 bot_command-notify = Уведомления
 bot_command-tz = Установить время
 bot_command-start = /start
 bot_command-version = Версия бота
 
 error-button_wrong_user = Не твоя кнопка
+error-invalid_year = 🚫 Год должен быть от { $min } до { $max }
 
 mood-unset = Не указано
 mood-awesome = Прекрасно
@@ -22,6 +24,32 @@ mood_month =
     <i>Текущая дата: { $current_dmy }</i>
 
 
+mood_year-panel =
+    <tg-emoji emoji-id="5431897022456145283">📆</tg-emoji> Календарь настроения
+
+    <b>{ $year }</b>
+
+    { $months }
+
+mood_year-no_marks = —
+mood_year-open_button = 🗓 { $year }
+
+
+mood_stats-panel =
+    📊 <b>Статистика настроения</b>
+
+    Отмечено дней: { $marked_days }
+    { $distribution }
+
+    🔥 Текущая серия: { $streak }
+    🏆 Лучшая серия: { $best_streak }
+
+    Среднее за 7 дней: { $average_7 }
+    Среднее за 30 дней: { $average_30 }
+
+mood_stats-no_data = —
+
+
 mood_day-main_panel =
     <tg-emoji emoji-id="5471978009449731768">👉</tg-emoji> <b>{ $year }, { $month }, { $day }</b>
 
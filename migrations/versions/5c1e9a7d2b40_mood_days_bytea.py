@@ -0,0 +1,49 @@
+"""mood table: store `days` as bytea
+
+Revision ID: 5c1e9a7d2b40
+Revises: 43b2aeed9749
+Create Date: 2026-10-17 10:12:41.208113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e9a7d2b40'
+down_revision: Union[str, Sequence[str], None] = '43b2aeed9749'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('mood', sa.Column('days_bytes', sa.LargeBinary(), nullable=True))
+    # json list of mood indexes -> one byte per day
+    op.execute(
+        """
+        UPDATE mood SET days_bytes = coalesce((
+            SELECT decode(string_agg(lpad(to_hex(value::int), 2, '0'), '' ORDER BY ord), 'hex')
+            FROM json_array_elements_text(days) WITH ORDINALITY AS t(value, ord)
+        ), ''::bytea)
+        """
+    )
+    op.drop_column('mood', 'days')
+    op.alter_column('mood', 'days_bytes', new_column_name='days', nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('mood', sa.Column('days_json', sa.JSON(), nullable=True))
+    op.execute(
+        """
+        UPDATE mood SET days_json = coalesce((
+            SELECT json_agg(get_byte(days, i) ORDER BY i)
+            FROM generate_series(0, length(days) - 1) AS i
+        ), '[]'::json)
+        """
+    )
+    op.drop_column('mood', 'days')
+    op.alter_column('mood', 'days_json', new_column_name='days', nullable=False)
@@ -0,0 +1,43 @@
+"""index: `mood_config.notify_time`, drop per-user notify jobs
+
+Revision ID: b7d2e9f41c08
+Revises: a3f48d61c2e7
+Create Date: 2026-10-17 14:02:31.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e9f41c08'
+down_revision: Union[str, Sequence[str], None] = 'a3f48d61c2e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_mood_config_notify_time',
+        'mood_config',
+        ['notify_time'],
+        unique=False,
+        postgresql_where=sa.text('notify_state'),
+    )
+    # notifications are sent by single `mood_notify_tick` job
+    if sa.inspect(op.get_bind()).has_table('apscheduler_jobs'):
+        op.execute("DELETE FROM apscheduler_jobs WHERE id LIKE 'mood_notify:%'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        'ix_mood_config_notify_time',
+        table_name='mood_config',
+        postgresql_where=sa.text('notify_state'),
+    )
+    if sa.inspect(op.get_bind()).has_table('apscheduler_jobs'):
+        op.execute("DELETE FROM apscheduler_jobs WHERE id = 'mood_notify_tick'")
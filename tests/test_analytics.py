@@ -0,0 +1,200 @@
+import datetime
+import math
+import random
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app import analytics
+from app.analytics import MoodMatrix
+from app.mood import Mood
+
+
+class MoodMatrixTest(unittest.TestCase):
+    def test_fill_in_chunks(self):
+        start, end = datetime.date(2025, 1, 30), datetime.date(2025, 2, 2)
+        matrix = MoodMatrix.empty([20, 10], start, end)
+        matrix.fill([(10, 2025, 1, bytes(range(31))), (30, 2025, 1, bytes(31))])
+        matrix.fill([(20, 2025, 2, bytes([5] * 28))])
+
+        self.assertEqual(matrix.user_ids.tolist(), [10, 20])
+        np.testing.assert_array_equal(matrix.days, [[29, 30, 0, 0], [0, 0, 5, 5]])
+
+    def test_from_rows(self):
+        start, end = datetime.date(2025, 1, 1), datetime.date(2025, 1, 3)
+        rows = [(7, 2025, 1, bytes([1, 2, 3] + [0] * 28))]
+        matrix = MoodMatrix.from_rows(rows, start, end)
+        self.assertEqual(matrix.user_ids.tolist(), [7])
+        np.testing.assert_array_equal(matrix.row(7), [1, 2, 3])
+
+
+def dates(matrix: MoodMatrix) -> list[datetime.date]:
+    return [
+        matrix.start + datetime.timedelta(days=i) for i in range(matrix.days.shape[1])
+    ]
+
+
+def months(matrix: MoodMatrix) -> list[list[int]]:
+    """Columns of each month"""
+    result: dict[tuple[int, int], list[int]] = {}
+    for column, date in enumerate(dates(matrix)):
+        result.setdefault((date.year, date.month), []).append(column)
+    return list(result.values())
+
+
+def correlation(xs: list[int], ys: list[int]) -> float:
+    n = len(xs)
+    if n < 2:
+        return math.nan
+    mean_x, mean_y = sum(xs) / n, sum(ys) / n
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    var_y = sum((y - mean_y) ** 2 for y in ys)
+    if not var_x or not var_y:
+        return math.nan
+    return cov / math.sqrt(var_x * var_y)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Linear interpolation between closest ranks, as numpy default"""
+    values = sorted(values)
+    if not values:
+        return math.nan
+    k = (len(values) - 1) * p / 100
+    low = math.floor(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+class MoodAnalyticsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        # Jan 29 (Monday) .. Apr 3, 2024, leap February is left unmarked
+        start, end = datetime.date(2024, 1, 29), datetime.date(2024, 4, 3)
+        self.matrix = MoodMatrix.empty(range(1, 8), start, end)
+        rng = random.Random(7)
+        for row, user_days in enumerate(self.matrix.days):
+            for column, date in enumerate(dates(self.matrix)):
+                if date.month != 2 and rng.random() < 0.7:
+                    user_days[column] = rng.randint(1, 6)
+            if row == 0:
+                user_days[:] = 0  # never marked
+            elif row == 1:
+                user_days[-20:] = 0  # marked only in January and early March
+            elif row == 2:
+                user_days[-10:] = 3  # current streak, same mood
+            elif row == 3:
+                user_days[:] = np.where(np.arange(len(user_days)) % 7 == 2, 5, 0)
+                user_days[3:32] = 0  # February
+        self.rows = [[int(x) for x in days] for days in self.matrix.days]
+
+    def test_weekday_counts(self):
+        result = analytics.weekday_counts(self.matrix)
+        for row, days in enumerate(self.rows):
+            expected = np.zeros((7, len(Mood)), dtype=int)
+            for date, mood in zip(dates(self.matrix), days):
+                expected[date.weekday(), mood] += 1
+            np.testing.assert_array_equal(result[row], expected)
+
+    def test_weekday_correlation(self):
+        result = analytics.weekday_correlation(self.matrix)
+        for row, days in enumerate(self.rows):
+            marked = [(d, mood) for d, mood in zip(dates(self.matrix), days) if mood]
+            for weekday in range(7):
+                expected = correlation(
+                    [int(d.weekday() == weekday) for d, _ in marked],
+                    [mood for _, mood in marked],
+                )
+                with self.subTest(row=row, weekday=weekday):
+                    if math.isnan(expected):
+                        self.assertTrue(math.isnan(result[row, weekday]))
+                    else:
+                        self.assertAlmostEqual(result[row, weekday], expected)
+        # single weekday marked: undefined for every weekday
+        self.assertTrue(np.isnan(result[3]).all())
+
+    def test_monthly_distribution(self):
+        result = analytics.monthly_distribution(self.matrix)
+        self.assertEqual(result.shape, (7, 4, len(Mood)))
+        for row, days in enumerate(self.rows):
+            for month, columns in enumerate(months(self.matrix)):
+                expected = [0] * len(Mood)
+                for column in columns:
+                    expected[days[column]] += 1
+                self.assertEqual(result[row, month].tolist(), expected)
+        # February is unmarked, all of its days are counted as unset
+        self.assertTrue((result[:, 1, 0] == 29).all())
+
+    def test_monthly_mean(self):
+        result = analytics.monthly_mean(self.matrix)
+        for row, days in enumerate(self.rows):
+            for month, columns in enumerate(months(self.matrix)):
+                marked = [days[column] for column in columns if days[column]]
+                with self.subTest(row=row, month=month):
+                    if marked:
+                        self.assertAlmostEqual(
+                            result[row, month], sum(marked) / len(marked)
+                        )
+                    else:
+                        self.assertTrue(math.isnan(result[row, month]))
+        self.assertTrue(np.isnan(result[:, 1]).all())
+
+    def test_streaks(self):
+        current, best = analytics.streaks(self.matrix)
+        for row, days in enumerate(self.rows):
+            run, runs = 0, [0]
+            for mood in days:
+                run = run + 1 if mood else 0
+                runs.append(run)
+            with self.subTest(row=row):
+                self.assertEqual(current[row], run)
+                self.assertEqual(best[row], max(runs))
+        self.assertEqual((current[0], best[0]), (0, 0))
+        self.assertGreaterEqual(current[2], 10)
+
+    def test_percentile_bands(self):
+        values = analytics.monthly_mean(self.matrix)
+        percentiles = (10, 25, 50, 75, 90)
+        result = analytics.percentile_bands(values, percentiles)
+        for month in range(values.shape[1]):
+            column = [x for x in values[:, month].tolist() if not math.isnan(x)]
+            for index, p in enumerate(percentiles):
+                expected = percentile(column, p)
+                with self.subTest(month=month, p=p):
+                    if math.isnan(expected):
+                        self.assertTrue(math.isnan(result[index, month]))
+                    else:
+                        self.assertAlmostEqual(result[index, month], expected)
+        # February has no marks at all
+        self.assertTrue(np.isnan(result[:, 1]).all())
+
+    def test_chunks_do_not_change_results(self):
+        chunks = MoodMatrix.chunks
+        expected = [
+            analytics.weekday_counts(self.matrix),
+            analytics.weekday_correlation(self.matrix),
+            analytics.monthly_distribution(self.matrix),
+            analytics.monthly_mean(self.matrix),
+            *analytics.streaks(self.matrix),
+        ]
+        with mock.patch.object(
+            MoodMatrix, "chunks", lambda self, size=2: chunks(self, 2)
+        ):
+            result = [
+                analytics.weekday_counts(self.matrix),
+                analytics.weekday_correlation(self.matrix),
+                analytics.monthly_distribution(self.matrix),
+                analytics.monthly_mean(self.matrix),
+                *analytics.streaks(self.matrix),
+            ]
+        for x, y in zip(result, expected):
+            np.testing.assert_array_equal(x, y)
+
+    def test_empty_matrix(self):
+        matrix = MoodMatrix.empty(
+            [], datetime.date(2024, 1, 1), datetime.date(2024, 1, 31)
+        )
+        self.assertEqual(analytics.weekday_correlation(matrix).shape, (0, 7))
+        self.assertEqual(analytics.monthly_mean(matrix).shape, (0, 1))
+        current, best = analytics.streaks(matrix)
+        self.assertEqual((len(current), len(best)), (0, 0))
@@ -0,0 +1,111 @@
+import unittest
+from types import SimpleNamespace
+
+from app.handlers.middlewares import AntiFlood, FloodWindow
+
+
+def hits(state: FloodWindow, now: float, count: int, window=3.0, burst=6) -> int:
+    """Events of `count` let through at `now`"""
+    return sum(state.hit(now, window, burst) for _ in range(count))
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def time(self) -> float:
+        return self.now
+
+
+class FloodWindowTest(unittest.TestCase):
+    def test_burst(self):
+        state = FloodWindow(start=0.0)
+        self.assertEqual(hits(state, 0.0, 10), 6)
+        self.assertEqual(state.skipped, 4)
+
+    def test_previous_window_is_weighted(self):
+        state = FloodWindow(start=0.0)
+        hits(state, 0.0, 6)
+        # whole previous window still counts at its end
+        self.assertEqual(hits(state, 3.0, 1), 0)
+        # half of previous window counts in the middle of current one
+        self.assertEqual(hits(state, 4.5, 10), 3)
+
+    def test_window_boundary(self):
+        state = FloodWindow(start=0.0)
+        hits(state, 0.0, 6)
+        # just before second window ends, tiny part of first one remains
+        self.assertEqual(hits(state, 5.99, 10), 5)
+
+        state = FloodWindow(start=0.0)
+        hits(state, 0.0, 6)
+        self.assertEqual(hits(state, 6.0, 10), 6)
+
+    def test_idle_windows_are_forgotten(self):
+        state = FloodWindow(start=0.0)
+        hits(state, 0.0, 6)
+        self.assertEqual(hits(state, 1000.0, 10), 6)
+        self.assertEqual(state.start, 999.0)
+
+
+class AntiFloodTest(unittest.IsolatedAsyncioTestCase):
+    anti_flood = AntiFlood(window=3.0, burst=6)
+
+    def setUp(self) -> None:
+        self.clock = Clock()
+        self.anti_flood.users.clear()
+        self.anti_flood.users.timer = self.clock.time
+        self.anti_flood.skipped = 0
+        self.anti_flood._next_expire = 0.0
+        self.reports: list[tuple[int, int]] = []
+        self.anti_flood.report = lambda user_id, state: self.reports.append(
+            (user_id, state.skipped)
+        )
+
+    async def send(self, user_id: int, count: int = 1) -> int:
+        handled = 0
+
+        async def handler(event, data):
+            nonlocal handled
+            handled += 1
+
+        data = {
+            "event_context": SimpleNamespace(user_id=user_id),
+            "app_cfg": SimpleNamespace(owners={1}),
+            "loop": self.clock,
+        }
+        for _ in range(count):
+            await self.anti_flood(handler, None, data)  # type: ignore
+        return handled
+
+    async def test_users_are_limited_separately(self):
+        self.assertEqual(await self.send(2, 10), 6)
+        self.assertEqual(await self.send(3, 10), 6)
+        self.assertEqual(await self.send(1, 10), 10)  # owner
+        self.assertEqual(self.anti_flood.skipped, 8)
+
+    async def test_idle_user_expires(self):
+        await self.send(2, 10)
+        self.clock.now = 5.9
+        self.assertIn(2, self.anti_flood.users)
+
+        # two windows since last event of user
+        self.clock.now = 6.0
+        self.assertNotIn(2, self.anti_flood.users)
+        self.assertEqual(await self.send(2, 10), 6)
+        self.assertEqual(self.reports, [(2, 4)])
+
+    async def test_idle_users_are_dropped_every_minute(self):
+        await self.send(2, 10)
+        await self.send(3)
+        self.clock.now = 60.0
+        await self.send(4)
+        self.assertEqual(list(self.anti_flood.users), [4])
+        self.assertEqual(self.reports, [(2, 4)])
+
+    async def test_active_user_is_kept(self):
+        for second in range(10):
+            self.clock.now = float(second)
+            await self.send(2)
+            self.anti_flood.users.expire()
+        self.assertIn(2, self.anti_flood.users)
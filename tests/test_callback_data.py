@@ -0,0 +1,139 @@
+import enum
+import itertools
+import unittest
+from types import NoneType, UnionType
+from typing import Any, Callable, Literal, Union, get_args, get_origin
+
+from aiogram.filters.callback_data import CallbackData as _CallbackData
+
+from app.handlers.callback_data import (
+    CallbackData,
+    MoodMonthCallback,
+    MoodNotifySetTime,
+)
+
+
+class Kind(enum.Enum):
+    DAY = "day"
+    MONTH = "month"
+
+
+class Sample(CallbackData):
+    """Fields codec leaves to pydantic"""
+
+    kind: Kind
+    flag: bool = False
+    chat_id: int | None = None
+    note: str = ""
+
+
+def subclasses(cls: type) -> list[type[CallbackData]]:
+    return [x for sub in cls.__subclasses__() for x in [sub, *subclasses(sub)]]
+
+
+def samples(annotation: Any) -> list[Any]:
+    """Values valid for field annotation"""
+    if annotation is int:
+        return [0, -7, 2025, -1001234567890]
+    if annotation is str:
+        return ["12:30", "", "мяу"]
+    if annotation is bool:
+        return [True, False]
+    if annotation is NoneType:
+        return [None]
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return list(annotation)
+    if get_origin(annotation) is Literal:
+        return list(get_args(annotation))
+    if get_origin(annotation) in (Union, UnionType):
+        return [x for arg in get_args(annotation) for x in samples(arg)]
+    raise TypeError(annotation)
+
+
+def instances(cls: type[CallbackData]):
+    fields = {
+        name: samples(field.annotation) for name, field in cls.model_fields.items()
+    }
+    count = max(map(len, fields.values()), default=1)
+    for i in range(count):
+        yield cls(**{name: values[i % len(values)] for name, values in fields.items()})
+
+
+def aiogram_pack(obj: CallbackData) -> str:
+    return _CallbackData.pack(obj)
+
+
+def outcome(pack: Callable[[], str]) -> str | type[Exception]:
+    """Packed value or error type"""
+    try:
+        return pack()
+    except ValueError as e:
+        return type(e)
+
+
+class CallbackCodecTest(unittest.TestCase):
+    def test_all_classes_are_covered(self):
+        names = {cls.__name__ for cls in subclasses(CallbackData)}
+        self.assertGreaterEqual(len(names), 15)
+        self.assertIn("MarkMoodDay", names)
+        self.assertIn("MoodNotifySetChat", names)
+
+    def test_pack(self):
+        for cls in subclasses(CallbackData):
+            for obj in instances(cls):
+                with self.subTest(obj=obj):
+                    self.assertEqual(
+                        outcome(obj.pack), outcome(lambda: aiogram_pack(obj))
+                    )
+
+    def test_pack_merge(self):
+        for cls, source_cls in itertools.product(subclasses(CallbackData), repeat=2):
+            source = next(instances(source_cls))
+            for obj in instances(cls):
+                args = {
+                    name: value
+                    for name, value in obj.__dict__.items()
+                    if name not in source.__dict__ or len(name) % 2
+                }
+                with self.subTest(cls=cls, source=source, args=args):
+                    self.assertEqual(
+                        outcome(lambda: cls.pack_merge(source, **args)),
+                        outcome(lambda: aiogram_pack(cls.merge(source, **args))),
+                    )
+
+    def test_pack_update(self):
+        for cls in subclasses(CallbackData):
+            objs = list(instances(cls))
+            for obj, other in zip(objs, objs[1:]):
+                with self.subTest(obj=obj, other=other):
+                    updated = obj.model_copy(update=other.__dict__)
+                    self.assertEqual(
+                        outcome(lambda: obj.pack_update(**other.__dict__)),
+                        outcome(lambda: aiogram_pack(updated)),
+                    )
+
+    def test_limit(self):
+        free = 64 - len(MoodNotifySetTime(user_id=1, time="").pack())
+        obj = MoodNotifySetTime(user_id=1, time="x" * free)
+        self.assertEqual(len(obj.pack().encode()), 64)
+        self.assertEqual(obj.pack(), aiogram_pack(obj))
+        for obj in (
+            MoodNotifySetTime(user_id=1, time="x" * (free + 1)),
+            # fits in characters, but not in bytes
+            MoodNotifySetTime(user_id=1, time="ю" * (free // 2 + 1)),
+            MoodNotifySetTime(user_id=1, time="a|b"),
+        ):
+            with self.subTest(obj=obj):
+                with self.assertRaises(ValueError):
+                    aiogram_pack(obj)
+                with self.assertRaises(ValueError):
+                    obj.pack()
+
+    def test_coerced_values_fall_back_to_pydantic(self):
+        cd = MoodMonthCallback(user_id=1, year=2025, month=1)
+        for args in ({"marker": True}, {"alert_marker": 1}, {"year": "2026"}):
+            with self.subTest(args=args):
+                self.assertEqual(
+                    MoodMonthCallback.pack_merge(cd, **args),
+                    aiogram_pack(MoodMonthCallback.merge(cd, **args)),
+                )
@@ -0,0 +1,87 @@
+import asyncio
+import unittest
+
+from aiogram.fsm.storage.base import StorageKey
+
+from app.main import ConcurrentEventError, EventIsolation, event_payload
+
+
+def user_key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+class EventIsolationTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.isolation = EventIsolation(max_depth=3)
+        self.handled: list[tuple[int, object]] = []
+        self.skipped: list[tuple[int, object]] = []
+        self.running = 0
+        self.max_running = 0
+        self.duration = 0.01
+
+    async def event(self, user_id: int, payload: object = None):
+        """Handle update of user, `payload` is identity of callback query"""
+        event_payload.set(payload)
+        try:
+            async with self.isolation.lock(user_key(user_id)):
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+                await asyncio.sleep(self.duration)
+                self.running -= 1
+                self.handled.append((user_id, payload))
+        except ConcurrentEventError:
+            self.skipped.append((user_id, payload))
+
+    async def burst(self, *events: tuple[int, object]):
+        tasks = []
+        for user_id, payload in events:
+            tasks.append(asyncio.create_task(self.event(user_id, payload)))
+            await asyncio.sleep(0)  # arrival order
+        await asyncio.gather(*tasks)
+
+    async def test_same_user_in_order(self):
+        await self.burst(*((1, i) for i in range(4)))
+        self.assertEqual(self.handled, [(1, i) for i in range(4)])
+        self.assertEqual(self.max_running, 1)
+        self.assertEqual(self.isolation.stats.queued, 3)
+
+    async def test_users_in_parallel(self):
+        self.duration = 0.5  # all start before first one ends
+        await self.burst(*((user_id, None) for user_id in range(20)))
+        self.assertEqual(len(self.handled), 20)
+        self.assertEqual(self.max_running, 20)
+
+    async def test_double_tap_coalesced(self):
+        await self.burst((1, "mark:5"), (1, "mark:5"), (1, "mark:6"), (1, "mark:5"))
+        self.assertEqual(self.handled, [(1, "mark:5"), (1, "mark:6")])
+        self.assertEqual(self.isolation.stats.coalesced, 2)
+
+    async def test_same_payload_after_handled(self):
+        await self.burst((1, "mark:5"))
+        await self.burst((1, "mark:5"))
+        self.assertEqual(len(self.handled), 2)
+
+    async def test_depth_bounded(self):
+        # one running and `max_depth` waiting, the rest is skipped
+        await self.burst(*((1, i) for i in range(6)))
+        self.assertEqual(self.handled, [(1, i) for i in range(4)])
+        self.assertEqual(self.skipped, [(1, 4), (1, 5)])
+        self.assertEqual(self.isolation.stats.dropped, 2)
+
+    async def test_replayed_burst(self):
+        """Double taps of 50 users, no distinct update is lost"""
+        events = [
+            (user_id, payload)
+            for tap in range(3)
+            for user_id in range(50)
+            for payload in (f"day:{tap}", f"day:{tap}")
+        ]
+        await self.burst(*events)
+
+        self.assertEqual(len(self.skipped), 150)
+        self.assertEqual(self.isolation.stats.dropped, 0)
+        for user_id in range(50):
+            self.assertEqual(
+                [payload for user, payload in self.handled if user == user_id],
+                ["day:0", "day:1", "day:2"],
+            )
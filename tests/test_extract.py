@@ -0,0 +1,32 @@
+import unittest
+
+from pydantic import BaseModel
+
+from aiogram.types import Chat, Message, Update, User
+
+from app._database.extract import extract_users
+
+
+class Mention(BaseModel):
+    who: User
+
+
+class ExtractUsersTest(unittest.TestCase):
+    def test_update(self):
+        user = User(id=1, is_bot=False, first_name="a")
+        update = Update(
+            update_id=1,
+            message=Message(
+                message_id=1,
+                date=0,  # type: ignore
+                chat=Chat(id=1, type="private"),
+                from_user=user,
+            ),
+        )
+        self.assertEqual(extract_users(update), [user])
+
+    def test_user_field_after_user_planned(self):
+        # `User` is planned while walking `Update` first
+        extract_users(Update(update_id=1))
+        user = User(id=2, is_bot=False, first_name="b")
+        self.assertEqual(extract_users(Mention(who=user)), [user])
@@ -0,0 +1,93 @@
+import re
+import unittest
+from types import SimpleNamespace
+
+from app import metrics
+from app._database.writer import WriteBehindQueue
+from app.main import dp
+from app.utils import LRUCache
+
+SAMPLE = re.compile(r'^(\w+)(\{\w+="[^"]*"(,\w+="[^"]*")*\})? (\S+)$')
+
+
+async def save(rows):
+    pass
+
+
+class RegistryTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        users = LRUCache[int, int](10)
+        users[1] = 1
+        users.get(1)
+        users.get(2)
+        writers = {
+            name: WriteBehindQueue[int, int](name, save)
+            for name in ("users", "user_last_message", "apscheduler_jobs")
+        }
+        writers["users"].put(1, 1)
+        writers["users"].put(1, 2)
+        await writers["users"].flush()
+
+        dp["db"] = SimpleNamespace(
+            cache=SimpleNamespace(
+                users=users, mood_months=LRUCache(10), mood_years=LRUCache(10)
+            ),
+            users_writer=writers["users"],
+            last_message_writer=writers["user_last_message"],
+        )
+        dp["scheduler"] = SimpleNamespace(
+            jobstore=SimpleNamespace(writer=writers["apscheduler_jobs"])
+        )
+        dp["anti_flood_mw"] = SimpleNamespace(users=[1, 2], skipped=3)
+
+    def tearDown(self) -> None:
+        for key in ("db", "scheduler", "anti_flood_mw"):
+            del dp[key]
+
+    def parse(self) -> tuple[dict[str, str], dict[str, str]]:
+        """`(metric name: type, sample: value)` of rendered registry"""
+        types: dict[str, str] = {}
+        samples: dict[str, str] = {}
+        for line in metrics.registry.render().splitlines():
+            if line.startswith("# TYPE "):
+                _, _, name, type = line.split(" ")
+                types[name] = type
+            elif not line.startswith("# HELP "):
+                match = SAMPLE.match(line)
+                self.assertIsNotNone(match, line)
+                sample, value = line.rsplit(" ", 1)
+                samples[sample] = value
+        return types, samples
+
+    def test_cumulative_totals_are_counters(self):
+        types, samples = self.parse()
+        for name in (
+            "cache_events_total",
+            "write_behind_events_total",
+            "update_isolation_events_total",
+            "anti_flood_skipped_total",
+        ):
+            self.assertEqual(types[name], "counter")
+        for name, type in types.items():
+            self.assertEqual(type == "counter", name.endswith("_total"), name)
+
+        self.assertEqual(samples['cache_events_total{cache="users",event="hits"}'], "1")
+        self.assertEqual(
+            samples['cache_events_total{cache="users",event="misses"}'], "1"
+        )
+        self.assertEqual(
+            samples['write_behind_events_total{queue="users",event="coalesced"}'], "1"
+        )
+        self.assertEqual(samples["anti_flood_skipped_total"], "3")
+        self.assertEqual(types["anti_flood_users"], "gauge")
+        self.assertEqual(samples["anti_flood_users"], "2")
+
+    def test_flush_latency_histogram(self):
+        types, samples = self.parse()
+        self.assertEqual(types["write_behind_flush_seconds"], "histogram")
+        count = int(samples['write_behind_flush_seconds_count{queue="users"}'])
+        self.assertGreaterEqual(count, 1)
+        self.assertEqual(
+            samples['write_behind_flush_seconds_bucket{queue="users",le="+Inf"}'],
+            str(count),
+        )
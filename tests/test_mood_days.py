@@ -0,0 +1,81 @@
+import copy
+import unittest
+
+from pydantic import ValidationError
+
+from app.database import MoodMonth
+from app.mood import Mood, MoodDays
+
+
+class MoodDaysTest(unittest.TestCase):
+    def test_bytes_and_list(self):
+        moods = [Mood.UNSET, Mood.AWESOME, Mood.UNSET, Mood.TERRIBLE, Mood.OKAY]
+        indexes = [mood.index for mood in moods]
+        for data in (bytes(indexes), bytearray(indexes), indexes, moods):
+            with self.subTest(data=data):
+                days = MoodDays(data)
+                self.assertEqual(list(days), moods)
+                self.assertEqual(bytes(days), bytes(indexes))
+                self.assertEqual(MoodDays(bytes(days)), days)
+                self.assertEqual(MoodDays(list(days)), days)
+                self.assertEqual(days, moods)
+                self.assertEqual(days[1:4], moods[1:4])
+                self.assertEqual(days[3], Mood.TERRIBLE)
+                self.assertEqual(days.counts(), (2, 1, 0, 0, 1, 0, 1))
+
+    def test_copy_is_independent(self):
+        days = MoodDays(bytes(3))
+        for other in (copy.copy(days), copy.deepcopy(days)):
+            other[0] = Mood.GOOD
+            self.assertEqual(days[0], Mood.UNSET)
+
+    def test_convert(self):
+        for mood in Mood:
+            self.assertIs(Mood.convert(mood.index), mood)
+            self.assertIs(Mood.convert(mood.emoji), mood)
+            self.assertIs(Mood.from_index(mood.index), mood)
+        self.assertEqual(Mood.convert_many(b"\x00\x06"), [Mood.UNSET, Mood.TERRIBLE])
+        for value in (7, "🙂", None):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                Mood.convert(value)  # type: ignore
+
+
+class MoodMonthSchemaTest(unittest.TestCase):
+    def month(self, days) -> MoodMonth:
+        return MoodMonth.model_validate(
+            {"user_id": 1, "year": 2025, "month": 2, "days": days, "days_notes": None}
+        )
+
+    def test_round_trip(self):
+        month = MoodMonth(user_id=1, year=2025, month=2)
+        month.save_mood(1, Mood.AWESOME)
+        month.save_mood(28, Mood.BAD)
+
+        dumped = month.model_dump()
+        self.assertEqual(dumped["days"], b"\x01" + bytes(26) + b"\x05")
+        self.assertEqual(self.month(dumped["days"]), month)
+
+        dumped = month.model_dump(mode="json")
+        self.assertEqual(dumped["days"], [1, *[0] * 26, 5])
+        self.assertEqual(self.month(dumped["days"]), month)
+        self.assertEqual(MoodMonth.model_validate_json(month.model_dump_json()), month)
+
+    def test_unset_days(self):
+        month = MoodMonth(user_id=1, year=2025, month=2)
+        self.assertEqual(bytes(month.days), bytes(28))
+        self.assertEqual(month.days_notes, [None] * 28)
+        self.assertTrue(month.is_empty)
+        self.assertEqual(self.month(bytes(28)), month)
+        self.assertEqual(self.month([Mood.UNSET] * 28), month)
+
+    def test_invalid_days(self):
+        for days in (None, [1, None], [7], b"\x07", [-1], "\x01", 1):
+            with self.subTest(days=days), self.assertRaises(ValidationError):
+                self.month(days)
+
+    def test_assignment_validated(self):
+        month = MoodMonth(user_id=1, year=2025, month=2)
+        month.days = [Mood.GOOD] * 28  # type: ignore
+        self.assertIsInstance(month.days, MoodDays)
+        with self.assertRaises(ValidationError):
+            month.days = [None] * 28  # type: ignore
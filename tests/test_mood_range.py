@@ -0,0 +1,121 @@
+import datetime
+import unittest
+
+from app._database import orm
+from app._database.database import Database
+from app.mood import Mood
+
+
+class FakeSession:
+    def __init__(self, db: "FakeDatabase") -> None:
+        self.db = db
+
+    async def __aenter__(self):
+        self.db.open_sessions += 1
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.db.open_sessions -= 1
+
+    async def scalars(self, stmt):
+        params = stmt.compile().params
+        user_id, start, end = (
+            params["user_id_1"],
+            (params["param_1"], params["param_2"]),
+            (params["param_3"], params["param_4"]),
+        )
+        self.db.queries.append((start, end))
+        return [
+            row
+            for row in self.db.rows
+            if row.user_id == user_id and start <= (row.year, row.month) <= end
+        ]
+
+
+class FakeDatabase:
+    __call__ = Database.__call__
+    get_mood_range = Database.get_mood_range
+
+    def __init__(self, rows: list[orm.MoodMonth]) -> None:
+        self.rows = rows
+        self.open_sessions = 0
+        self.queries: list[tuple[tuple[int, int], tuple[int, int]]] = []
+
+    def sessionmaker(self):
+        return FakeSession(self)
+
+
+def row(user_id: int, year: int, month: int, mood: Mood) -> orm.MoodMonth:
+    return orm.MoodMonth(
+        user_id=user_id, year=year, month=month, days=bytes([mood.index]) + bytes(27)
+    )
+
+
+class MoodRangeTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.db = FakeDatabase(
+            [
+                row(1, 2024, 11, Mood.GOOD),
+                row(1, 2025, 2, Mood.BAD),
+                row(1, 2026, 1, Mood.AWESOME),
+                row(2, 2025, 3, Mood.TERRIBLE),
+            ]
+        )
+
+    async def months(self, start: datetime.date, end: datetime.date, **kwargs):
+        result = []
+        async for mood_month in self.db.get_mood_range(1, start, end, **kwargs):
+            self.assertEqual(self.db.open_sessions, 0)
+            result.append(mood_month)
+        return result
+
+    async def test_empty_months_filled(self):
+        months = await self.months(
+            datetime.date(2024, 10, 15), datetime.date(2026, 2, 3), chunk_size=5
+        )
+        self.assertEqual(
+            [(x.year, x.month) for x in months],
+            [(2024, 10), (2024, 11), (2024, 12)]
+            + [(2025, month) for month in range(1, 13)]
+            + [(2026, 1), (2026, 2)],
+        )
+        self.assertEqual(
+            {(x.year, x.month): x.days[0] for x in months if x.days.any()},
+            {(2024, 11): Mood.GOOD, (2025, 2): Mood.BAD, (2026, 1): Mood.AWESOME},
+        )
+        self.assertTrue(all(x.user_id == 1 for x in months))
+
+    async def test_chunks(self):
+        await self.months(
+            datetime.date(2024, 10, 1), datetime.date(2026, 2, 1), chunk_size=5
+        )
+        self.assertEqual(
+            self.db.queries,
+            [
+                ((2024, 10), (2025, 2)),
+                ((2025, 3), (2025, 7)),
+                ((2025, 8), (2025, 12)),
+                ((2026, 1), (2026, 2)),
+            ],
+        )
+
+    async def test_year_is_one_query(self):
+        months = await self.months(
+            datetime.date(2025, 1, 1), datetime.date(2025, 12, 1)
+        )
+        self.assertEqual(len(months), 12)
+        self.assertEqual(self.db.queries, [((2025, 1), (2025, 12))])
+
+    async def test_abandoned_iteration(self):
+        months = self.db.get_mood_range(
+            1, datetime.date(2025, 1, 1), datetime.date(2025, 12, 1), chunk_size=2
+        )
+        await anext(months)
+        self.assertEqual(self.db.open_sessions, 0)
+        self.assertEqual(len(self.db.queries), 1)
+        await months.aclose()
+
+    async def test_empty_range(self):
+        months = await self.months(datetime.date(2025, 3, 1), datetime.date(2025, 2, 1))
+        self.assertEqual(months, [])
+        self.assertEqual(self.db.queries, [])
@@ -0,0 +1,47 @@
+import datetime
+import unittest
+from types import SimpleNamespace
+
+from app.database import MoodMonth, MoodStats
+from app.handlers.mood import MoodStatsHandler
+from app.mood import Mood
+
+
+class FakeDatabase:
+    def __init__(self, months: list[MoodMonth]) -> None:
+        self.months = {(x.year, x.month): x for x in months}
+
+    async def get_mood_stats(self, user_id: int):
+        return MoodStats(user_id=user_id)
+
+    async def get_mood_range(self, user_id, start, end):
+        month = start.replace(day=1)
+        while month <= end:
+            yield self.months.get(
+                (month.year, month.month),
+                MoodMonth(user_id=user_id, year=month.year, month=month.month),
+            )
+            month = (month + datetime.timedelta(days=31)).replace(day=1)
+
+
+class MoodStatsPanelTest(unittest.IsolatedAsyncioTestCase):
+    async def test_average_30_spans_three_months(self):
+        january = MoodMonth(user_id=1, year=2025, month=1)
+        january.save_mood(31, Mood.TERRIBLE)
+        march = MoodMonth(user_id=1, year=2025, month=3)
+        march.save_mood(1, Mood.AWESOME)
+
+        data = {
+            "db": FakeDatabase([january, march]),
+            "i18n": SimpleNamespace(
+                get=str,
+                mood_stats=SimpleNamespace(panel=dict, no_data=lambda: "-"),
+            ),
+            "user_config": SimpleNamespace(
+                user_id=1, current_time=datetime.datetime(2025, 3, 1, 12)
+            ),
+        }
+        panel = await MoodStatsHandler.panel(data)  # type: ignore
+
+        self.assertEqual(panel["text"]["average_7"], f"{Mood.AWESOME.emoji} 1.0")
+        self.assertEqual(panel["text"]["average_30"], f"{Mood.OKAY.emoji} 3.5")
@@ -0,0 +1,110 @@
+import asyncio
+import unittest
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import EditMessageText, SendMessage
+
+from app.config import AppConfig
+from app.ratelimit import SendRateLimiter, bulk_sends
+
+
+class FakeSession:
+    """Records loop time of each request, may answer flood wait first"""
+
+    def __init__(self, flood_waits: dict[int, float] | None = None) -> None:
+        self.sent: list[tuple[float, str, int | str]] = []
+        self.flood_waits = flood_waits or {}
+
+    async def __call__(self, bot, method):
+        now = asyncio.get_running_loop().time()
+        if (retry_after := self.flood_waits.pop(method.chat_id, None)) is not None:
+            raise TelegramRetryAfter(method, "Flood control exceeded", retry_after)  # type: ignore
+        self.sent.append((now, method.__api_method__, method.chat_id))
+        return True
+
+
+def send(chat_id: int):
+    return SendMessage(chat_id=chat_id, text="-")
+
+
+def request(limiter: SendRateLimiter, session: FakeSession, method):
+    return limiter(session, None, method)  # type: ignore
+
+
+class SendRateLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_global_rate(self):
+        limiter = SendRateLimiter(global_rate=200)
+        session = FakeSession()
+        await asyncio.gather(
+            *(request(limiter, session, send(i)) for i in range(1, 101))
+        )
+
+        times = [time for time, _, _ in session.sent]
+        for i, time in enumerate(times):
+            self.assertGreaterEqual(time - times[0], (i - 1) / 200 - 1e-3)
+
+    async def test_chat_interval_between_new_messages_only(self):
+        limiter = SendRateLimiter(global_rate=1000, group_interval=0.05)
+        session = FakeSession()
+        await asyncio.gather(
+            *(request(limiter, session, send(-100)) for _ in range(4)),
+            *(
+                request(
+                    limiter,
+                    session,
+                    EditMessageText(chat_id=-100, message_id=1, text="-"),
+                )
+                for _ in range(10)
+            ),
+        )
+
+        sends = [time for time, method, _ in session.sent if method == "sendMessage"]
+        edits = [time for time, method, _ in session.sent if method != "sendMessage"]
+        for previous, time in zip(sends, sends[1:]):
+            self.assertGreaterEqual(time - previous, 0.05 - 1e-3)
+        self.assertLess(edits[-1] - edits[0], 0.05)
+
+    async def test_interactive_before_bulk(self):
+        limiter = SendRateLimiter(global_rate=100)
+        session = FakeSession()
+
+        async def notifications():
+            with bulk_sends():
+                await asyncio.gather(
+                    *(request(limiter, session, send(i)) for i in range(1, 31))
+                )
+
+        bulk = asyncio.create_task(notifications())
+        await asyncio.sleep(0.05)
+        await asyncio.gather(
+            *(request(limiter, session, send(-i)) for i in range(1, 4))
+        )
+        await bulk
+
+        order = [chat_id for _, _, chat_id in session.sent]
+        # replies wait for one token at most, not behind whole bulk queue
+        self.assertLess(max(order.index(-i) for i in range(1, 4)), 12)
+
+    async def test_retry_after(self):
+        limiter = SendRateLimiter(global_rate=1000)
+        session = FakeSession(flood_waits={1: 0.1})
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(
+            request(limiter, session, send(1)), request(limiter, session, send(2))
+        )
+
+        self.assertEqual(sorted(chat_id for _, _, chat_id in session.sent), [1, 2])
+        # flood wait pauses other chats too
+        for time, _, _ in session.sent:
+            self.assertGreaterEqual(time - start, 0.1 - 1e-3)
+
+    def test_rate_split_between_workers(self):
+        app_cfg = AppConfig.model_construct(send_global_rate=30, send_primary_share=0.5)
+        rates = [
+            SendRateLimiter.from_config(app_cfg, workers=4, worker_index=i).bucket.rate
+            for i in range(4)
+        ]
+        self.assertEqual(rates, [15, 5, 5, 5])
+        single = SendRateLimiter.from_config(app_cfg)
+        self.assertEqual(single.bucket.rate, 30)
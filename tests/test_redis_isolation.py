@@ -0,0 +1,119 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.redis import RedisEventIsolation, RedisStorage
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from pydantic import Secret
+
+from app.main import EventIsolation, dp, setup_storage
+
+
+def user_key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+class RedisEventIsolationTest(unittest.IsolatedAsyncioTestCase):
+    """Two processes with local queues sharing one redis"""
+
+    def setUp(self) -> None:
+        server = FakeServer()
+        self.processes = [
+            EventIsolation(backend=RedisEventIsolation(FakeRedis(server=server)))
+            for _ in range(2)
+        ]
+        self.handled: list[tuple[int, int]] = []
+        self.running: dict[int, int] = {}
+        self.max_running: dict[int, int] = {}
+
+    async def asyncTearDown(self) -> None:
+        for process in self.processes:
+            await process.close()
+
+    async def event(self, process: int, user_id: int):
+        async with self.processes[process].lock(user_key(user_id)):
+            self.running[user_id] = self.running.get(user_id, 0) + 1
+            self.max_running[user_id] = max(
+                self.max_running.get(user_id, 0), self.running[user_id]
+            )
+            await asyncio.sleep(0.05)
+            self.running[user_id] -= 1
+            self.handled.append((process, user_id))
+
+    async def test_same_user_across_processes(self):
+        await asyncio.gather(*(self.event(i % 2, 1) for i in range(6)))
+        self.assertEqual(len(self.handled), 6)
+        self.assertEqual(self.max_running, {1: 1})
+        # the rest waited in local queues, not on redis lock
+        for process in self.processes:
+            self.assertEqual(process.stats.queued, 2)
+            self.assertEqual(process.stats.processed, 3)
+
+    async def test_users_in_parallel(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(self.event(i % 2, i) for i in range(10)))
+        self.assertLess(loop.time() - start, 0.5)
+        self.assertEqual(set(self.max_running.values()), {1})
+
+    async def test_lock_released(self):
+        redis = self.processes[0].backend.redis  # type: ignore
+        async with self.processes[0].lock(user_key(1)):
+            self.assertEqual(len(await redis.keys("*:lock")), 1)
+        self.assertEqual(await redis.keys("*:lock"), [])
+
+
+class SetupStorageTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.server = FakeServer()
+        storage, backend = dp.fsm.storage, dp.fsm.events_isolation.backend
+
+        def restore():
+            dp.fsm.storage = storage
+            dp.fsm.events_isolation.backend = backend
+
+        self.addCleanup(restore)
+
+    def config(self, redis_url: str | None):
+        return SimpleNamespace(
+            redis_url=None if redis_url is None else Secret(redis_url),
+            fsm_ttl=3600,
+        )
+
+    def setup_storage(self, redis_url: str | None):
+        def from_url(url: str, **kwargs):
+            self.assertEqual(url, redis_url)
+            return RedisStorage(FakeRedis(server=self.server), **kwargs)
+
+        with mock.patch.object(RedisStorage, "from_url", from_url):
+            setup_storage(self.config(redis_url))  # type: ignore
+
+    async def test_without_redis(self):
+        storage = dp.fsm.storage
+        self.setup_storage(None)
+        self.assertIs(dp.fsm.storage, storage)
+        self.assertIsNone(dp.fsm.events_isolation.backend)
+
+    async def test_states_and_locks_in_redis(self):
+        self.setup_storage("redis://localhost:6379/0")
+        storage = dp.fsm.storage
+        isolation = dp.fsm.events_isolation
+        self.assertIsInstance(storage, RedisStorage)
+        self.assertIsInstance(isolation, EventIsolation)
+        self.assertIsInstance(isolation.backend, RedisEventIsolation)
+        self.addAsyncCleanup(storage.close)
+
+        key = user_key(42)
+        await storage.set_state(key, "mood:note")
+        redis = FakeRedis(server=self.server)
+        state_key = storage.key_builder.build(key, "state")
+        self.assertTrue(state_key.startswith("fsm:1:"))  # with bot id
+        self.assertEqual(await redis.get(state_key), b"mood:note")
+        self.assertAlmostEqual(await redis.ttl(state_key), 3600, delta=1)
+
+        async with isolation.lock(key):
+            self.assertTrue(await redis.exists(storage.key_builder.build(key, "lock")))
+        self.assertFalse(await redis.exists(storage.key_builder.build(key, "lock")))
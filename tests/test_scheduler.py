@@ -0,0 +1,65 @@
+import asyncio
+import time
+import unittest
+from datetime import UTC
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from app.scheduler import AsyncJobStore
+
+
+def notify(user_id: int):
+    pass
+
+
+class AsyncJobStoreTest(unittest.IsolatedAsyncioTestCase):
+    async def test_config_changes_burst(self):
+        """Jobs are persisted in background, loop is never stalled by database"""
+        saved: dict[str, object] = {}
+
+        async def save_changes(changes):
+            await asyncio.sleep(0.02)  # database round trip
+            for job_id, row in changes:
+                if row is None:
+                    saved.pop(job_id, None)
+                else:
+                    saved[job_id] = row
+
+        store = AsyncJobStore(interval=0.05)
+        store.writer.flush_callback = save_changes
+        await store.writer.start()
+        scheduler = AsyncIOScheduler(timezone=UTC)
+        scheduler.add_jobstore(store)
+        scheduler.start(paused=True)
+
+        max_stall = 0.0
+
+        async def ticker():
+            nonlocal max_stall
+            while True:
+                start = time.perf_counter()
+                await asyncio.sleep(0)
+                max_stall = max(max_stall, time.perf_counter() - start)
+
+        ticker_task = asyncio.create_task(ticker())
+        for i in range(1000):
+            # `on_change_config` of 500 users, each changing time twice
+            job_id = f"notify:{i % 500}"
+            scheduler.add_job(
+                notify,
+                "cron",
+                args=(i % 500,),
+                hour=i % 24,
+                id=job_id,
+                replace_existing=True,
+            )
+            if i % 7 == 0:
+                scheduler.remove_job(job_id)
+            await asyncio.sleep(0)
+        ticker_task.cancel()
+        scheduler.shutdown(wait=False)
+        await store.close()
+
+        self.assertEqual(saved.keys(), {job.id for job in store.get_all_jobs()})
+        self.assertLess(store.writer.stats.flushes, 100)
+        self.assertLess(max_stall, 0.02)
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import os
+import sys
+import time
+import unittest
+from collections import Counter
+from pathlib import Path
+
+from aiohttp import ClientSession, UnixConnector, web
+from aiohttp.test_utils import TestClient, TestServer
+from pydantic import Secret
+
+from app.config import AppConfig
+from app.sharding import Supervisor, Worker, get_route_key
+
+
+updates = json.loads((Path(__file__).parent / "data" / "updates.json").read_text())
+
+
+class RouteKeyTest(unittest.TestCase):
+    def test_recorded_updates(self):
+        """Recorded updates are routed by user, then chat, then update id"""
+        keys = {update["update_id"]: get_route_key(update) for update in updates}
+        self.assertEqual(
+            keys,
+            {
+                100: 111,
+                101: 111,
+                102: 222,
+                103: 222,
+                104: 333,
+                105: 333,
+                106: 444,
+                107: 555,
+                108: -1005678,
+                109: 109,
+            },
+        )
+
+    def test_user_stays_on_worker(self):
+        by_user: dict[int, list[dict]] = {}
+        for update in updates:
+            if (user_id := _user_id(update)) is not None:
+                by_user.setdefault(user_id, []).append(update)
+
+        for workers in range(1, 9):
+            for user_id, user_updates in by_user.items():
+                self.assertEqual(
+                    {get_route_key(update) % workers for update in user_updates},
+                    {user_id % workers},
+                )
+
+    def test_balanced(self):
+        """Consecutive user ids spread evenly over workers"""
+        template = updates[0]
+        counts = Counter()
+        for user_id in range(10_000_000, 10_004_000):
+            raw = json.dumps(template).replace("111", str(user_id))
+            counts[get_route_key(json.loads(raw)) % 4] += 1
+        self.assertEqual(sorted(counts), [0, 1, 2, 3])
+        self.assertLess(max(counts.values()) - min(counts.values()), 4000 * 0.05)
+
+
+def exiting_worker(index: int, socket: str, restarted: bool):
+    """Crashes on first start, leaves marker of each start next to socket"""
+    Path(f"{socket}.{index}.{restarted}").touch()
+    if not restarted:
+        sys.exit(3)
+    time.sleep(60)
+
+
+def noop_worker(index: int, socket: str, restarted: bool):
+    pass
+
+
+class FakeWorker:
+    """Worker process stand-in serving webhook on unix socket"""
+
+    def __init__(self, worker: Worker) -> None:
+        self.worker = worker
+        self.received: list[bytes] = []
+        self.runner: web.AppRunner | None = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.received.append(await request.read())
+        return web.json_response({})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/webhook", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.UnixSite(self.runner, self.worker.socket).start()
+        if self.worker.session is None:
+            self.worker.session = ClientSession(
+                connector=UnixConnector(path=self.worker.socket)
+            )
+
+    async def stop(self):
+        assert self.runner is not None
+        await self.runner.cleanup()
+
+
+class SupervisorTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        app_cfg = AppConfig.model_construct(
+            webhook_path="/webhook", webhook_secret=Secret("secret")
+        )
+        self.supervisor = Supervisor(app_cfg, 3, noop_worker)
+        self.fake_workers = [FakeWorker(worker) for worker in self.supervisor.workers]
+        for fake_worker in self.fake_workers:
+            await fake_worker.start()
+
+        app = web.Application()
+        app.router.add_post("/webhook", self.supervisor.handle)
+        app.on_cleanup.append(self.supervisor.on_cleanup)
+        self.client = TestClient(TestServer(app))
+        await self.client.start_server()
+
+    async def asyncTearDown(self) -> None:
+        await self.client.close()
+        for fake_worker in self.fake_workers:
+            await fake_worker.stop()
+
+    async def post(self, update: dict, secret: str | None = "secret") -> int:
+        headers = {}
+        if secret is not None:
+            headers["X-Telegram-Bot-Api-Secret-Token"] = secret
+        async with self.client.post(
+            "/webhook", data=json.dumps(update), headers=headers
+        ) as response:
+            return response.status
+
+    async def test_recorded_updates_are_forwarded_by_user(self):
+        for update in updates:
+            self.assertEqual(await self.post(update), 200)
+
+        for index, fake_worker in enumerate(self.fake_workers):
+            expected = [
+                update for update in updates if get_route_key(update) % 3 == index
+            ]
+            self.assertEqual(list(map(json.loads, fake_worker.received)), expected)
+            self.assertEqual(self.supervisor.workers[index].routed, len(expected))
+
+    async def test_throughput_report(self):
+        template = updates[0]
+        statuses = await asyncio.gather(
+            *(
+                self.post(
+                    {
+                        **template,
+                        "message": {**template["message"], "from": {"id": user_id}},
+                    }
+                )
+                for user_id in range(300)
+            )
+        )
+        self.assertEqual(set(statuses), {200})
+        self.assertEqual([len(x.received) for x in self.fake_workers], [100] * 3)
+
+        with self.assertLogs("app.sharding", "INFO") as logs:
+            self.supervisor.report(2.0)
+            self.supervisor.report(2.0)
+        self.assertEqual(
+            [record.getMessage() for record in logs.records],
+            [
+                *(f"Worker {i}: 100 updates, 50.0/s, 0 failed total" for i in range(3)),
+                *(f"Worker {i}: 0 updates, 0.0/s, 0 failed total" for i in range(3)),
+            ],
+        )
+
+    async def test_secret_token(self):
+        for secret in ("wrong", "", None):
+            with self.subTest(secret=secret):
+                self.assertEqual(await self.post(updates[0], secret), 401)
+        self.assertEqual(sum(len(x.received) for x in self.fake_workers), 0)
+
+    async def test_bad_request(self):
+        async with self.client.post(
+            "/webhook",
+            data=b"{",
+            headers={"X-Telegram-Bot-Api-Secret-Token": "secret"},
+        ) as response:
+            self.assertEqual(response.status, 400)
+
+    async def test_worker_down(self):
+        update = updates[0]
+        fake_worker = self.fake_workers[get_route_key(update) % 3]
+        await fake_worker.stop()
+        with self.assertLogs("app.sharding", "WARNING"):
+            self.assertEqual(await self.post(update), 503)
+        self.assertEqual(fake_worker.worker.failed, 1)
+        await fake_worker.start()
+        self.assertEqual(await self.post(update), 200)
+
+
+class SupervisorRestartTest(unittest.IsolatedAsyncioTestCase):
+    async def test_crashed_worker_is_restarted(self):
+        app_cfg = AppConfig.model_construct(webhook_path="/webhook")
+        supervisor = Supervisor(app_cfg, 2, exiting_worker)
+        for worker in supervisor.workers:
+            supervisor.start_worker(worker)
+
+        with self.assertLogs("app.sharding", "INFO") as logs:
+            monitor = asyncio.create_task(supervisor.monitor())
+            markers = [f"{w.socket}.{w.index}.True" for w in supervisor.workers]
+            async with asyncio.timeout(60):
+                while not all(map(os.path.exists, markers)):
+                    await asyncio.sleep(0.1)
+            monitor.cancel()
+            await supervisor.on_cleanup(web.Application())
+
+        messages = [record.getMessage() for record in logs.records]
+        for index in range(2):
+            self.assertIn(f"Worker {index} exited with code 3, restarting", messages)
+        self.assertFalse(os.path.exists(supervisor.socket_dir))
+
+
+def _user_id(update: dict) -> int | None:
+    for event in update.values():
+        if isinstance(event, dict):
+            user = event.get("from") or event.get("user")
+            if user is not None:
+                return user["id"]
+    return None
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from pydantic import Secret
+
+from app import main, webhook
+from app.config import AppConfig
+
+updates = json.loads((Path(__file__).parent / "data" / "updates.json").read_text())
+
+
+class WebhookTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.dispatcher = Dispatcher()
+        self.dispatcher.update.outer_middleware.register(self.handle)
+        self.handled: list[int] = []
+        self.running = 0
+        self.max_running = 0
+        self.duration = 0.0
+        self.bot = Bot("42:TEST")
+
+    async def handle(self, handler, update, data):
+        """Records update instead of routing it"""
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.duration)
+        self.running -= 1
+        self.handled.append(update.update_id)
+
+    def run_webhook(
+        self, unix_socket: str | None = None
+    ) -> tuple[web.Application, dict]:
+        """Application and address `run_webhook` serves"""
+        app_cfg = AppConfig.model_construct(
+            webhook_secret=Secret("secret"), webhook_concurrency=2
+        )
+        with (
+            mock.patch.object(webhook, "dp", self.dispatcher),
+            mock.patch.object(main, "PRIMARY_PROCESS", False),
+            mock.patch.object(web, "run_app") as run_app,
+        ):
+            webhook.run_webhook(self.bot, app_cfg, unix_socket=unix_socket)
+        (app,), address = run_app.call_args
+        address.pop("print"), address.pop("loop").close()
+        return app, address
+
+    async def post(self, client: TestClient, update: dict, secret: str | None):
+        headers = {} if secret is None else {"X-Telegram-Bot-Api-Secret-Token": secret}
+        response = await client.post("/webhook", json=update, headers=headers)
+        return response.status
+
+    async def test_updates_reach_dispatcher(self):
+        app, address = self.run_webhook()
+        self.assertEqual(address, {"host": "127.0.0.1", "port": 8080})
+        async with TestClient(TestServer(app)) as client:
+            for update in updates:
+                self.assertEqual(await self.post(client, update, "secret"), 200)
+        # accepted updates are handled before shutdown
+        self.assertEqual(self.handled, [update["update_id"] for update in updates])
+
+    async def test_secret_token(self):
+        app, _ = self.run_webhook()
+        async with TestClient(TestServer(app)) as client:
+            for secret in (None, "", "wrong"):
+                with self.subTest(secret=secret):
+                    self.assertEqual(await self.post(client, updates[0], secret), 401)
+        self.assertEqual(self.handled, [])
+
+    async def test_secret_checked_by_supervisor(self):
+        app, address = self.run_webhook(unix_socket="/tmp/worker.sock")
+        self.assertEqual(address, {"path": "/tmp/worker.sock"})
+        async with TestClient(TestServer(app)) as client:
+            self.assertEqual(await self.post(client, updates[0], None), 200)
+        self.assertEqual(self.handled, [updates[0]["update_id"]])
+
+    async def test_concurrency_bounded(self):
+        self.duration = 0.05
+        app, _ = self.run_webhook()
+        async with TestClient(TestServer(app)) as client:
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            statuses = await asyncio.gather(
+                *(self.post(client, update, "secret") for update in updates)
+            )
+            # answered without waiting for handling
+            self.assertLess(loop.time() - start, self.duration * 2)
+            self.assertEqual(statuses, [200] * len(updates))
+        self.assertEqual(len(self.handled), len(updates))
+        self.assertEqual(self.max_running, 2)
@@ -0,0 +1,95 @@
+import unittest
+
+from app._database.writer import WriteBehindQueue
+
+
+class FakeDatabase:
+    """Saves rows unless database is down or row is bad, counts transactions"""
+
+    def __init__(self, bad: set[int] = set()) -> None:
+        self.saved: dict[int, int] = {}
+        self.bad = bad
+        self.down = False
+        self.transactions = 0
+
+    async def save(self, rows: list[tuple[int, int]]):
+        self.transactions += 1
+        if self.down or any(key in self.bad for key, _ in rows):
+            raise ConnectionError("write failed")
+        self.saved.update(rows)
+
+
+def queue(db: FakeDatabase, **kwargs):
+    return WriteBehindQueue[int, tuple[int, int]]("test", db.save, **kwargs)
+
+
+class WriteBehindQueueTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        # every case fails some writes
+        self.enterContext(self.assertLogs("app._database.writer", "WARNING"))
+
+    async def test_bad_row_is_found_by_splitting(self):
+        db = FakeDatabase(bad={37})
+        writer = queue(db)
+        for key in range(500):
+            writer.put(key, (key, 1))
+        await writer.flush()
+
+        self.assertEqual(len(db.saved), 499)
+        self.assertNotIn(37, db.saved)
+        self.assertEqual(writer.depth, 1)
+        self.assertLess(db.transactions, 25)
+        self.assertEqual(writer.stats.flushed, 499)
+
+    async def test_bad_row_is_dropped_after_attempts(self):
+        db = FakeDatabase(bad={0})
+        writer = queue(db, max_attempts=3)
+        writer.put(0, (0, 1))
+        for i in range(3):
+            for key in range(1, 10):
+                writer.put(key, (key, i))
+            await writer.flush()
+        self.assertEqual(writer.depth, 0)
+        self.assertEqual(writer.stats.dropped, 1)
+
+    async def test_outage_is_not_written_row_by_row(self):
+        db = FakeDatabase()
+        db.down = True
+        writer = queue(db, max_attempts=2)
+        for key in range(500):
+            writer.put(key, (key, 1))
+        for _ in range(5):
+            await writer.flush()
+
+        # batch, its halves down to single row, and next row
+        self.assertLessEqual(db.transactions, 5 * 12)
+        self.assertEqual(writer.depth, 500)
+        self.assertEqual(writer.stats.dropped, 0)
+
+        db.down = False
+        await writer.flush()
+        self.assertEqual(len(db.saved), 500)
+
+    async def test_newer_value_is_kept(self):
+        db = FakeDatabase()
+        db.down = True
+        writer = queue(db)
+        writer.put(1, (1, 1))
+        await writer.flush()
+        writer.put(1, (1, 2))
+        db.down = False
+        await writer.flush()
+        self.assertEqual(db.saved, {1: 2})
+
+    async def test_max_pending(self):
+        db = FakeDatabase()
+        db.down = True
+        writer = queue(db, max_pending=100)
+        for key in range(150):
+            writer.put(key, (key, 1))
+        await writer.flush()
+        writer.put(0, (0, 2))  # coalesced, not new key
+
+        self.assertEqual(writer.depth, 100)
+        self.assertEqual(writer.stats.overflowed, 50)
+        self.assertEqual(writer.get(0), (0, 2))